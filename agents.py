@@ -0,0 +1,44 @@
+import importlib
+import importlib.util
+import os
+import sys
+
+
+# name -> path of an agent module (a module with an Agent class and a play_as(color) function)
+REGISTRY = {}
+_loaded = {}
+
+
+def register(name, path):
+    REGISTRY[name] = os.path.abspath(path)
+
+
+# every *_agent.py next to this file is registered under its module name
+def discover(directory=os.path.dirname(os.path.abspath(__file__))):
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith("_agent.py"):
+            register(file_name[:-3], os.path.join(directory, file_name))
+
+
+# Agent class of the named implementation playing color
+#
+# every (name, color) pair gets its own module instance, so one implementation can play both
+# colors in the same match without sharing module level state (knowledge base file, planner, ...)
+def load_agent(name, color):
+    if (name, color) in _loaded:
+        return _loaded[(name, color)]
+    if name not in REGISTRY:
+        raise KeyError(f"unknown agent '{name}', registered: {', '.join(sorted(REGISTRY))}")
+
+    module = importlib.import_module(name) if os.path.dirname(REGISTRY[name]) == os.path.dirname(os.path.abspath(__file__)) else None
+    if module is None or module.MY != color:
+        spec = importlib.util.spec_from_file_location(f"{name}@{color}", REGISTRY[name])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+        module.play_as(color)
+    _loaded[(name, color)] = module.Agent
+    return module.Agent
+
+
+discover()
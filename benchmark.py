@@ -0,0 +1,114 @@
+from tournament import World
+from policies import RandomPolicy
+from memory_profile import format_report
+from config import *
+
+import contextlib
+import copy
+import io
+import random
+import time
+
+
+def _timed(function, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats
+
+
+# step() may skip idle ticks, so the loops here count world.tick and not calls
+def _warmed_up_world(seed, ticks):
+    random.seed(seed)
+    world = World(HEIGHT, WIDTH, 0)
+    world.generate_world()
+    with contextlib.redirect_stdout(io.StringIO()):
+        while world.tick < ticks and not world.win:
+            world.step()
+    if world.win:
+        raise ValueError(f"seed {seed} ends at tick {world.tick}, before the warm-up of {ticks} ticks")
+    return world
+
+
+# cost of World.clone() against copy.deepcopy and of stepping a clone with a rollout policy
+def benchmark_clone(seed=0, repeats=1000, rollout_ticks=50):
+    world = _warmed_up_world(seed, 100)
+    policy = RandomPolicy(seed)
+
+    clone_time = _timed(lambda: world.clone(policy), repeats)
+    deepcopy_time = _timed(lambda: copy.deepcopy(world), max(1, repeats // 100))
+
+    played = []
+
+    def rollout():
+        clone = world.clone(policy)
+        while clone.tick < world.tick + rollout_ticks and not clone.win:
+            clone.step()
+        played.append(clone.tick - world.tick)
+    rollout_time = _timed(rollout, max(1, repeats // 10))
+    ticks = sum(played) / len(played)
+
+    print(f"clone:    {clone_time * 1e6:10.1f} us")
+    print(f"deepcopy: {deepcopy_time * 1e6:10.1f} us")
+    print(f"rollout:  {rollout_time * 1e6:10.1f} us  ({ticks:.1f} ticks, {(rollout_time - clone_time) / max(ticks, 1) * 1e6:.1f} us/tick)")
+
+
+# full headless matches with and without skipping idle bullet ticks
+def benchmark_event_driven(seeds=range(5)):
+    for event_driven in (False, True):
+        start = time.perf_counter()
+        results = []
+        for seed in seeds:
+            random.seed(seed)
+            world = World(HEIGHT, WIDTH, 0, event_driven=event_driven)
+            world.generate_world()
+            with contextlib.redirect_stdout(io.StringIO()):
+                while not world.win:
+                    world.step()
+                world.terminate_agents()
+            results.append((world.win, world.tick))
+        print(f"event_driven={event_driven}: {time.perf_counter() - start:.2f} s  {results}")
+
+
+# match results with the memory profile of each match, with and without freezing the static map
+def benchmark_memory(seeds=range(3), snapshot_every=0):
+    for seed in seeds:
+        random.seed(seed)
+        world = World(HEIGHT, WIDTH, 0, memory_profile=True)
+        world.profiler.snapshot_every = snapshot_every
+        world.generate_world()
+        with contextlib.redirect_stdout(io.StringIO()):
+            while not world.win:
+                world.step()
+            world.terminate_agents()
+        print(f"seed {seed}: {world.win} ({world.win_reason}) after {world.tick} ticks")
+        print(format_report(world.memory_report()) + "\n")
+
+
+# ticks and wasted moves per match with each pathfinder, plus the cooperative planner's cost per tick
+def benchmark_pathfinders(seeds=range(10), pathfinders=("astar", "cooperative")):
+    for pathfinder in pathfinders:
+        start = time.perf_counter()
+        totals = {"ticks": 0, "moves": 0, "bounced": 0, "stacked": 0}
+        planner_ms = []
+        for seed in seeds:
+            random.seed(seed)
+            world = World(HEIGHT, WIDTH, 0, pathfinder=pathfinder)
+            with contextlib.redirect_stdout(io.StringIO()):
+                world.generate_world()
+                while not world.win:
+                    world.step()
+                world.terminate_agents()
+            totals["ticks"] += world.tick
+            for name in ("moves", "bounced", "stacked"):
+                totals[name] += world.move_stats[name]
+            planner_ms += [brain.team_planner.stats()["ms_per_tick"] for brain in world.brains.values() if brain.team_planner]
+        matches = len(seeds)
+        planner = f", planner {sum(planner_ms) / len(planner_ms):.2f} ms/tick per team" if planner_ms else ""
+        print(f"{pathfinder:<12} {time.perf_counter() - start:6.2f} s  ticks/match {totals['ticks'] / matches:6.1f}  "
+              f"moves {totals['moves']}  bounced {totals['bounced']}  stacked {totals['stacked']}{planner}")
+
+
+if __name__ == "__main__":
+    benchmark_clone()
+    benchmark_event_driven()
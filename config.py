@@ -3,3 +3,36 @@ WIDTH = 32 #32
 TICK_RATE = 0.01 #0.01
 
 ASCII_TILES = {"empty": " ", "wall": "#", "blue_agent": "b", "red_agent": "r", "blue_agent_f": "B", "red_agent_f": "R", "blue_flag": "{", "red_flag": "}", "bullet": ".", "unknown": "/"}
+
+MAX_TICKS = 5000
+STALEMATE_REPEATS = 8
+DECISION_CACHE_SIZE = 0 # cached first path steps per team, 0 disables decision caching
+VISIBILITY_CACHE_SIZE = 0 # max cached cells per map, 0 keeps every cell
+VISIBILITY_PRECOMPUTE = False
+PATHFINDER = "astar" # "astar", "hpa" (hierarchical, for large maps) or "cooperative" (team space-time reservations)
+HPA_CLUSTER_SIZE = 8
+COOPERATIVE_WINDOW = 8 # ticks the cooperative planner looks and reserves ahead
+EVENT_DRIVEN_TICKS = True # skip idle bullet ticks when nothing is in flight
+
+SPRT_ALPHA = 0.05 # chance of calling blue better when red is
+SPRT_BETA = 0.05 # chance of calling red better when blue is
+SPRT_DELTA = 0.1 # decisive-match win rate 0.5 +- delta separating the hypotheses
+SPRT_MAX_MATCHES = 1000
+
+BLUE_AGENT = "blue_agent" # registered agent implementations playing each color, see agents.py
+RED_AGENT = "red_agent"
+
+ELO_INITIAL = 1500
+ELO_K = 32
+LEAGUE_MATCHES = 100
+
+TEAM_SIZE = 3 # agents per color
+DECISION_BUDGET = 0 # seconds per agent decision, 0 disables the budget (matches stay deterministic)
+DECISION_WORKERS = 0 # worker processes evaluating agent decisions, one team per worker; 0 decides in-process
+DATASET_SHARD_RECORDS = 65536 # agent decisions per self-play dataset shard
+TEAM_OBSERVATION = False # fuse what each team sees once per tick in the engine instead of merging every agent's window
+MEMORY_PROFILE = False # tracemalloc per tick phase, gc pauses and peak rss, see memory_profile.py
+MEMORY_SNAPSHOT_EVERY = 0 # top allocation sites of every n-th call of a phase, 0 disables snapshots
+MEMORY_FREEZE_STATIC = False # gc.freeze() everything allocated by map generation
+GOLDEN_SEEDS = 300 # seeded matches in a golden-trace corpus, see golden.py
+GOLDEN_MAX_TICKS = 600
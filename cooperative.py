@@ -0,0 +1,144 @@
+import heapq
+import time
+
+
+# cooperative path planner for one team (windowed hierarchical cooperative A*), positions are
+# (row, col) like the agents use
+#
+# agents plan one after another in every tick; each searches in space-time over the next `window`
+# ticks around the cells and moves its teammates already reserved, then reserves its own path.
+# Cost-to-go comes from a backwards Dijkstra per goal, shared by the team for the tick. A tick
+# starts when an agent plans again, so the planner needs no tick counter from the engine
+class CooperativePlanner:
+
+    def __init__(self, tile_cost, blocked_cost, window=8, wait_cost=1):
+        self.tile_cost = tile_cost
+        self.blocked_cost = blocked_cost
+        self.window = window
+        self.wait_cost = wait_cost
+
+        self.grid = None
+        self.reserved = {}          # (cell, t) -> agent
+        self.planned = set()
+        self.distance_maps = {}     # goal -> {cell: cost to reach goal}
+
+        self.ticks = 0
+        self.plans = 0
+        self.expansions = 0
+        self.conflicts = 0
+        self.seconds = 0.0
+        self.tick_seconds = 0.0
+        self.max_tick_seconds = 0.0
+
+    # path from start towards goal for the next window ticks, a repeated cell is a wait; empty when
+    # the goal can not be reached, callers fall back to their own search then
+    def plan(self, agent, start, goal, grid):
+        begin = time.perf_counter()
+        if agent in self.planned:
+            self._next_tick()
+        self.planned.add(agent)
+        self.grid = grid
+
+        distance = self.distance_maps.get(goal)
+        if distance is None:
+            distance = self.distance_maps[goal] = self._distance_map(goal)
+        path = self._search(agent, start, goal, distance) if start in distance else []
+        for t, cell in enumerate(path[1:], 1):
+            self.reserved[(cell, t)] = agent
+
+        elapsed = time.perf_counter() - begin
+        self.plans += 1
+        self.seconds += elapsed
+        self.tick_seconds += elapsed
+        return path
+
+    def _next_tick(self):
+        self.ticks += 1
+        self.max_tick_seconds = max(self.max_tick_seconds, self.tick_seconds)
+        self.tick_seconds = 0.0
+        self.reserved = {}
+        self.planned = set()
+        self.distance_maps = {}
+
+    def _cost(self, cell):
+        cost = self.tile_cost(self.grid[cell[0]][cell[1]])
+        return 1 if cost is None or cost >= self.blocked_cost else cost  # only the goal can be blocked
+
+    def _neighbours(self, cell):
+        row, col = cell
+        for neighbour in ((row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)):
+            if 0 <= neighbour[0] < len(self.grid) and 0 <= neighbour[1] < len(self.grid[0]):
+                yield neighbour
+
+    def _open(self, cell):
+        cost = self.tile_cost(self.grid[cell[0]][cell[1]])
+        return cost is not None and cost < self.blocked_cost
+
+    # cost of the cheapest path from every cell to goal, through open cells only
+    def _distance_map(self, goal):
+        distance = {goal: 0}
+        open_set = [(0, goal)]
+        while open_set:
+            cost, cell = heapq.heappop(open_set)
+            if cost > distance[cell]:
+                continue
+            step = self._cost(cell)
+            for neighbour in self._neighbours(cell):
+                if not self._open(neighbour):
+                    continue
+                if neighbour not in distance or cost + step < distance[neighbour]:
+                    distance[neighbour] = cost + step
+                    heapq.heappush(open_set, (cost + step, neighbour))
+        return distance
+
+    def _blocked(self, agent, cell, neighbour, t):
+        other = self.reserved.get((neighbour, t + 1))
+        if other is not None and other is not agent:
+            return True
+        # two agents swapping cells pass through each other
+        other = self.reserved.get((neighbour, t))
+        return other is not None and other is not agent and self.reserved.get((cell, t + 1)) is other
+
+    def _search(self, agent, start, goal, distance):
+        cost = {(start, 0): 0}
+        parent = {(start, 0): None}
+        open_set = [(distance[start], 0, 0, start)]
+        while open_set:
+            _, current_cost, t, cell = heapq.heappop(open_set)
+            if current_cost > cost[(cell, t)]:
+                continue
+            self.expansions += 1
+            if cell == goal or t == self.window:
+                return self._trace(parent, (cell, t))
+            for neighbour in (*self._neighbours(cell), cell):
+                if neighbour not in distance:
+                    continue
+                if self._blocked(agent, cell, neighbour, t):
+                    self.conflicts += 1
+                    continue
+                new_cost = current_cost + (self.wait_cost if neighbour == cell else self._cost(neighbour))
+                state = (neighbour, t + 1)
+                if state not in cost or new_cost < cost[state]:
+                    cost[state] = new_cost
+                    parent[state] = (cell, t)
+                    heapq.heappush(open_set, (new_cost + distance[neighbour], new_cost, t + 1, neighbour))
+        return []
+
+    @staticmethod
+    def _trace(parent, state):
+        path = []
+        while state is not None:
+            path.append(state[0])
+            state = parent[state]
+        return path[::-1]
+
+    def stats(self):
+        ticks = max(self.ticks, 1)
+        return {
+            "ticks": self.ticks,
+            "plans": self.plans,
+            "expansions_per_plan": self.expansions / max(self.plans, 1),
+            "conflicts_avoided": self.conflicts,
+            "ms_per_tick": self.seconds / ticks * 1000,
+            "max_ms_per_tick": max(self.max_tick_seconds, self.tick_seconds) * 1000,
+        }
@@ -0,0 +1,150 @@
+from tournament import World
+from config import *
+
+import argparse
+import contextlib
+import io
+import multiprocessing
+import os
+import random
+import struct
+import tempfile
+import uuid
+
+
+# one fixed size record per agent decision, little endian without padding:
+#   window      81 bytes, the 9x9 visible window as ASCII tiles in row order
+#   x, y        uint16
+#   can_shoot   uint8
+#   holding     uint8
+#   action      uint8, index in ACTIONS
+#   direction   uint8, index in DIRECTIONS
+#   color       uint8, index in COLORS
+#   outcome     int8, 1 won / 0 tied / -1 lost for the agent's team, PENDING until the match ends
+#   match       uint32, match number of the writer that produced the shard
+#   tick        uint32
+RECORD = struct.Struct("<81sHHBBBBBbII")
+# np.memmap(path, dtype=np.dtype(NUMPY_DTYPE)) reads a shard without copying
+NUMPY_DTYPE = [("window", "S81"), ("x", "<u2"), ("y", "<u2"), ("can_shoot", "u1"), ("holding", "u1"), ("action", "u1"),
+               ("direction", "u1"), ("color", "u1"), ("outcome", "i1"), ("match", "<u4"), ("tick", "<u4")]
+COLOR_OFFSET = 89
+OUTCOME_OFFSET = 90
+
+ACTIONS = (None, "move", "shoot")
+DIRECTIONS = (None, "up", "down", "left", "right")
+COLORS = ("blue", "red")
+PENDING = -128
+
+
+# streams decisions into shards of shard_records records, <directory>/<prefix>-<pid>-<writer>-<n>.bin
+#
+# every writer names its shards with its pid and a random token, so writers never share a file, not
+# even several in one process or a reused pid in a later run, and an existing file is never
+# overwritten. The current shard is kept in memory and written once it is full; outcomes of matches
+# that are still running when a shard is written are patched into the file when the match ends
+class DatasetWriter:
+
+    def __init__(self, directory, shard_records=DATASET_SHARD_RECORDS, prefix="selfplay"):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.shard_records = shard_records
+        self.prefix = prefix
+        self.token = uuid.uuid4().hex[:12]
+        self.shard = bytearray()
+        self.shard_number = 0
+        self.shards = []
+        self.matches = 0
+        self.pending = {}   # match -> {shard number: [record index, ...]}
+        self.records = 0
+
+    def begin_match(self):
+        self.matches += 1
+        self.pending[self.matches] = {}
+        return self.matches
+
+    def record(self, match, tick, color, observation, action, direction):
+        visible_world, (x, y), can_shoot, holding_flag = observation
+        window = "".join("".join(row) for row in visible_world).encode("ascii")
+        self.pending[match].setdefault(self.shard_number, []).append(len(self.shard) // RECORD.size)
+        self.shard += RECORD.pack(window, x, y, bool(can_shoot), bool(holding_flag), ACTIONS.index(action),
+                                  DIRECTIONS.index(direction), COLORS.index(color), PENDING, match, tick)
+        self.records += 1
+        if len(self.shard) == self.shard_records * RECORD.size:
+            self.flush()
+
+    # back-fills the outcome of every record of the match, win is World.win
+    def end_match(self, match, win):
+        for shard_number, indices in self.pending.pop(match).items():
+            if shard_number == self.shard_number:
+                self._fill(self.shard, indices, win)
+                continue
+            with open(self.shards[shard_number], "r+b") as shard_file:
+                shard = bytearray(shard_file.read())
+                self._fill(shard, indices, win)
+                shard_file.seek(0)
+                shard_file.write(shard)
+
+    @staticmethod
+    def _fill(shard, indices, win):
+        for index in indices:
+            offset = index * RECORD.size
+            color = COLORS[shard[offset + COLOR_OFFSET]]
+            outcome = 0 if win == "tied" else 1 if win == color else -1
+            shard[offset + OUTCOME_OFFSET] = outcome & 0xFF
+
+    def flush(self):
+        if not self.shard:
+            return
+        path = os.path.join(self.directory, f"{self.prefix}-{os.getpid()}-{self.token}-{self.shard_number:05d}.bin")
+        with open(path, "xb") as shard_file:
+            shard_file.write(self.shard)
+        self.shards.append(path)
+        self.shard = bytearray()
+        self.shard_number += 1
+
+    def close(self):
+        self.flush()
+
+
+# records of a shard as tuples in RECORD field order, for reading without numpy
+def read_shard(path):
+    with open(path, "rb") as shard_file:
+        return list(RECORD.iter_unpack(shard_file.read()))
+
+
+# plays the seeds headless and streams every decision into one writer
+def record_matches(directory, seeds, shard_records=DATASET_SHARD_RECORDS, **world_options):
+    writer = DatasetWriter(directory, shard_records)
+    for seed in seeds:
+        random.seed(seed)
+        world = World(HEIGHT, WIDTH, 0, dataset=writer, **world_options)
+        with contextlib.redirect_stdout(io.StringIO()):
+            world.generate_world()
+            while not world.win:
+                world.step()
+            world.terminate_agents()
+    writer.close()
+    return writer.records
+
+
+# the agents keep their knowledge base in the working directory, so every worker gets its own
+def _record_worker(job):
+    directory, seeds, shard_records = job
+    os.chdir(tempfile.mkdtemp(prefix="selfplay-"))
+    return record_matches(directory, seeds, shard_records)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="record self-play decisions into memory-mappable shards")
+    parser.add_argument("directory")
+    parser.add_argument("--matches", type=int, default=100)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--shard-records", type=int, default=DATASET_SHARD_RECORDS)
+    args = parser.parse_args()
+
+    seeds = range(args.first_seed, args.first_seed + args.matches)
+    jobs = [(os.path.abspath(args.directory), seeds[worker::args.workers], args.shard_records) for worker in range(args.workers)]
+    with multiprocessing.Pool(args.workers) as pool:
+        records = sum(pool.map(_record_worker, jobs))
+    print(f"\n{records} records from {args.matches} matches in {args.directory}\n")
@@ -0,0 +1,63 @@
+from collections import OrderedDict
+
+
+# bounded LRU cache of agent path decisions keyed by everything planning depends on: the known map
+# (as cost classes), the start and the target
+class DecisionCache:
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(world_knowledge, cost_classes, start, goal):
+        return "".join(map("".join, world_knowledge)).translate(cost_classes), tuple(start), tuple(goal)
+
+    def lookup(self, key):
+        decision = self.entries.get(key)
+        if decision is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return decision
+
+    def store(self, key, decision):
+        self.entries[key] = decision
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+# gives agent the cache of its class in caches (class -> DecisionCache), created on first use; only
+# deterministic policies get one
+def attach_cache(agent, caches, max_size):
+    brain = type(agent)
+    if max_size and getattr(brain, "DETERMINISTIC", False):
+        if brain not in caches:
+            caches[brain] = DecisionCache(max_size)
+        agent.decision_cache = caches[brain]
+
+
+def cache_stats(caches):
+    return {brain.__module__: cache.stats() for brain, cache in caches.items()}
+
+
+def format_stats(stats):
+    return "\n".join(f"decision cache {name}: {entry['hits']} hits, {entry['misses']} misses "
+                     f"({entry['hit_rate']:.1%} hit rate), {entry['size']} entries, {entry['evictions']} evictions"
+                     for name, entry in stats.items())
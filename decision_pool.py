@@ -0,0 +1,202 @@
+from agents import REGISTRY, load_agent, register
+from decision_cache import attach_cache, cache_stats
+
+import contextlib
+import io
+import multiprocessing
+import sys
+import time
+import traceback
+
+
+# one agent decision with its wall time; with a budget the agent gets a deadline for planning and
+# the end of the budget, by which it must have returned
+def timed_decision(brain, observation, planning_time, budget=0):
+    start = time.perf_counter()
+    if planning_time:
+        brain.deadline = start + planning_time
+        brain.budget_end = start + budget
+    action, direction = brain.update(*observation)
+    return action, direction, time.perf_counter() - start
+
+
+# worker processes that host the agent brains and evaluate them concurrently
+#
+# a team shares its knowledge base and random stream, so all agents of one color live in the same
+# worker and are evaluated there in agent order; different teams run at the same time. Output the
+# brains print is sent back and printed in agent order, so the log matches the sequential engine.
+#
+# every worker keeps its own decision caches (cache_size as DECISION_CACHE_SIZE), for as long as the
+# pool lives.
+#
+# with a budget the engine waits at most the budget of every agent in a worker's batch; a batch that
+# is late gets no decisions (the engine falls back) and its reply is dropped when it arrives
+class DecisionPool:
+
+    def __init__(self, workers, cache_size=0):
+        self.cache_size = cache_size
+        self.connections = []
+        self.processes = []
+        for _ in range(workers):
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=_worker, args=(worker_connection,), daemon=True)
+            process.start()
+            self.connections.append(connection)
+            self.processes.append(process)
+        self.workers_of = {}
+        self.stale = [0] * workers  # replies of batches given up on, still to come from each worker
+
+    # stands in for the Agent class of name playing color in World.brains
+    def brain(self, name, color):
+        if color not in self.workers_of:
+            self.workers_of[color] = len(self.workers_of) % len(self.connections)
+        return RemoteTeam(self, self.workers_of[color], name, color)
+
+    def request(self, worker, message):
+        self.connections[worker].send(message)
+        status, result, output = self.receive(worker)
+        sys.stdout.write(output)
+        if status == "error":
+            raise RuntimeError(f"agent worker {worker} failed:\n{result}")
+        return result
+
+    # next reply of worker, dropping the ones of batches given up on first; None when deadline (a
+    # perf_counter time) passes before it arrives
+    def receive(self, worker, deadline=None):
+        connection = self.connections[worker]
+        while True:
+            if deadline is not None and not connection.poll(max(deadline - time.perf_counter(), 0)):
+                return None
+            reply = connection.recv()
+            if not self.stale[worker]:
+                return reply
+            self.stale[worker] -= 1
+
+    # (action, direction, elapsed) for every brain, in the order given
+    #
+    # holding_flag goes over as a bool like in vec_env, the Flag object is bound to the engine stores
+    def decide(self, brains, observations, planning_time, budget=0):
+        batches = {}
+        for position, (brain, (visible_world, agent_position, can_shoot, holding_flag)) in enumerate(zip(brains, observations)):
+            observation = (visible_world, agent_position, can_shoot, holding_flag is not None)
+            batches.setdefault(brain.worker, []).append((position, brain.key, observation))
+        start = time.perf_counter()
+        for worker, batch in batches.items():
+            self.connections[worker].send(("decide", [(key, observation) for _, key, observation in batch], planning_time, budget))
+
+        results = [None] * len(brains)
+        outputs = []
+        for worker, batch in batches.items():
+            reply = self.receive(worker, start + budget * len(batch) if budget else None)
+            if reply is None:
+                self.stale[worker] += 1
+                late = time.perf_counter() - start
+                for position, _, _ in batch:
+                    results[position] = (None, None, late)
+                continue
+            status, decisions, output = reply
+            if status == "error":
+                raise RuntimeError(f"agent worker {worker} failed:\n{decisions}")
+            outputs.extend(zip((position for position, _, _ in batch), output))
+            for (position, _, _), decision in zip(batch, decisions):
+                results[position] = decision
+        for _, output in sorted(outputs):
+            sys.stdout.write(output)
+        return results
+
+    # {module: DecisionCache.stats()} of every worker
+    def cache_stats(self):
+        stats = {}
+        for worker in range(len(self.connections)):
+            stats.update(self.request(worker, ("cache_stats",)))
+        return stats
+
+    def close(self):
+        for connection in self.connections:
+            connection.send(("close",))
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+
+class RemoteTeam:
+
+    def __init__(self, pool, worker, name, color):
+        self.pool = pool
+        self.worker = worker
+        self.name = name
+        self.color = color
+
+    def __call__(self, color, index):
+        self.pool.request(self.worker, ("create", (color, index), self.name, REGISTRY[self.name], color, index, self.pool.cache_size))
+        return RemoteBrain(self.pool, self.worker, (color, index))
+
+    def seed(self, value, team_size, pathfinder):
+        self.pool.request(self.worker, ("seed", self.name, REGISTRY[self.name], self.color, value, team_size, pathfinder))
+
+    def observe_team(self, cells, changed):
+        self.pool.request(self.worker, ("team", self.name, REGISTRY[self.name], self.color, cells, changed))
+
+
+class RemoteBrain:
+
+    def __init__(self, pool, worker, key):
+        self.pool = pool
+        self.worker = worker
+        self.key = key
+
+    def terminate(self, reason):
+        self.pool.request(self.worker, ("terminate", self.key, reason))
+
+
+def _worker(connection):
+    brains = {}
+    caches = {}  # agent class -> DecisionCache
+    while True:
+        message = connection.recv()
+        if message[0] == "close":
+            break
+        output = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(output):
+                result = _handle(brains, caches, message)
+        except Exception:
+            connection.send(("error", traceback.format_exc(), output.getvalue()))
+            continue
+        connection.send(("ok",) + result if message[0] == "decide" else ("ok", result, output.getvalue()))
+
+
+# decide replies with (decisions, output of each brain), everything else with its result
+def _handle(brains, caches, message):
+    kind = message[0]
+    if kind == "decide":
+        _, requests, planning_time, budget = message
+        decisions, outputs = [], []
+        for key, observation in requests:
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                decisions.append(timed_decision(brains[key], observation, planning_time, budget))
+            outputs.append(output.getvalue())
+        return decisions, outputs
+    if kind == "create":
+        _, key, name, path, color, index, cache_size = message
+        register(name, path)
+        brains[key] = load_agent(name, color)(color, index)
+        attach_cache(brains[key], caches, cache_size)
+    elif kind == "seed":
+        _, name, path, color, value, team_size, pathfinder = message
+        register(name, path)
+        load_agent(name, color).seed(value, team_size, pathfinder)
+    elif kind == "team":
+        _, name, path, color, cells, changed = message
+        register(name, path)
+        brain = load_agent(name, color)
+        if hasattr(brain, "observe_team"):
+            brain.observe_team(cells, changed)
+    elif kind == "cache_stats":
+        return cache_stats(caches)
+    elif kind == "terminate":
+        _, key, reason = message
+        brains.pop(key).terminate(reason)
+    return None
@@ -0,0 +1,96 @@
+import operator
+
+
+# parallel arrays backing agents, bullets and flags; handle objects only keep their slot
+class EntityStore:
+
+    ARRAYS = ("position", "direction", "color", "cooldown", "alive")
+
+    def __init__(self):
+        self.position = []
+        self.direction = []
+        self.color = []
+        self.cooldown = []
+        self.alive = []
+        self.handles = []
+        self.free = []
+        self.shared = False
+
+    # copy of the store that shares the arrays until either side writes to them
+    #
+    # handles are cloned too and bound to the new store, mapping is filled with old handle id -> new handle
+    def fork(self, mapping):
+        store = EntityStore.__new__(EntityStore)
+        for name in self.ARRAYS:
+            setattr(store, name, getattr(self, name))
+        store.free = list(self.free)
+        store.shared = self.shared = True
+        store.handles = []
+        for handle in self.handles:
+            mapping[id(handle)] = clone_handle(handle, store)
+            store.handles.append(mapping[id(handle)])
+        return store
+
+    def unshare(self):
+        for name in self.ARRAYS:
+            setattr(self, name, list(getattr(self, name)))
+        self.shared = False
+
+    def allocate(self, handle):
+        if self.shared:
+            self.unshare()
+        slot = len(self.alive)
+        self.position.append(None)
+        self.direction.append(None)
+        self.color.append(None)
+        self.cooldown.append(0)
+        self.alive.append(True)
+        self.handles.append(handle)
+        return slot
+
+    # reuses a released slot together with its handle object, None when the free-list is empty
+    def acquire(self):
+        if not self.free:
+            return None
+        if self.shared:
+            self.unshare()
+        slot = self.free.pop()
+        self.alive[slot] = True
+        self.cooldown[slot] = 0
+        return self.handles[slot]
+
+    def release(self, slot):
+        if self.shared:
+            self.unshare()
+        self.alive[slot] = False
+        self.free.append(slot)
+
+    def __len__(self):
+        return len(self.alive) - len(self.free)
+
+
+# attribute of a handle that lives in one of the store arrays
+def stored(array_name):
+    array = operator.attrgetter(array_name)
+
+    def get(handle):
+        return array(handle.store)[handle.slot]
+
+    def set(handle, value):
+        store = handle.store
+        if store.shared:
+            store.unshare()
+        array(store)[handle.slot] = value
+
+    return property(get, set)
+
+
+# shallow copy of a __slots__ handle bound to another store, bypassing any __setattr__ hooks
+def clone_handle(handle, store):
+    clone = object.__new__(type(handle))
+    for cls in type(handle).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(handle, name):
+                object.__setattr__(clone, name, getattr(handle, name))
+    object.__setattr__(clone, "store", store)
+    return clone
@@ -0,0 +1,205 @@
+from tournament import World
+from config import *
+
+import argparse
+import ast
+import contextlib
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+
+# everything that decides a match: agents (by slot, the per-match identity), bullets, flag holders
+# and the win state; the tick is kept next to it in the trace
+def trace_state(world):
+    agents = tuple(sorted((agent.color, agent.slot, agent.position, agent.can_shoot, agent.can_shoot_countdown,
+                           agent.holding_flag is not None) for agent in world.agents))
+    bullets = tuple(sorted((bullet.color, bullet.position, bullet.direction) for bullet in world.bullets))
+    flags = tuple((flag.color, flag.position, flag.agent_holding.slot if flag.agent_holding else None) for flag in world.flags)
+    return agents, bullets, flags, world.win, world.win_reason
+
+
+def digest(state):
+    return hashlib.blake2b(repr(state).encode(), digest_size=8).hexdigest()
+
+
+# [(tick, state), ...] of one seeded match, a state is only added when it differs from the previous
+# one, so engines that skip idle ticks trace the same as engines that run them
+def run_trace(seed, max_ticks=GOLDEN_MAX_TICKS, **world_options):
+    random.seed(seed)
+    world = World(HEIGHT, WIDTH, 0, max_ticks=max_ticks, **world_options)
+    trace = []
+
+    def tracer():
+        state = trace_state(world)
+        if not trace or trace[-1][1] != state:
+            trace.append((world.tick, state))
+
+    world.tracer = tracer
+    with contextlib.redirect_stdout(io.StringIO()):
+        world.generate_world()
+        tracer()
+        while not world.win:
+            world.step()
+        world.terminate_agents()
+    return trace
+
+
+# index of the first entry where the traces differ (tick or state), None when they are equal
+def first_divergence(reference, candidate, key=lambda entry: entry):
+    for i, (expected, actual) in enumerate(zip(reference, candidate)):
+        if key(expected) != key(actual):
+            return i
+    if len(reference) != len(candidate):
+        return min(len(reference), len(candidate))
+    return None
+
+
+# state in effect at tick: the last trace entry at or before it
+def state_at(trace, tick):
+    state = None
+    for entry_tick, entry_state in trace:
+        if entry_tick > tick:
+            break
+        state = entry_state
+    return state
+
+
+# lines describing only what differs between two trace states
+def state_diff(reference, candidate):
+    if reference is None or candidate is None:
+        return [f"reference {reference!r}", f"candidate {candidate!r}"]
+    lines = []
+    reference_agents = {agent[:2]: agent[2:] for agent in reference[0]}
+    candidate_agents = {agent[:2]: agent[2:] for agent in candidate[0]}
+    fields = ("position", "can_shoot", "cooldown", "holding")
+    for key in sorted(set(reference_agents) | set(candidate_agents)):
+        expected, actual = reference_agents.get(key), candidate_agents.get(key)
+        if expected is None or actual is None:
+            lines.append(f"agent {key[0]} {key[1]}: {'dead' if expected is None else 'alive'} in reference, "
+                         f"{'dead' if actual is None else 'alive'} in candidate")
+            continue
+        for name, value, other in zip(fields, expected, actual):
+            if value != other:
+                lines.append(f"agent {key[0]} {key[1]} {name}: {value} != {other}")
+    for bullet in sorted(set(reference[1]) - set(candidate[1])):
+        lines.append(f"bullet only in reference: {bullet}")
+    for bullet in sorted(set(candidate[1]) - set(reference[1])):
+        lines.append(f"bullet only in candidate: {bullet}")
+    for expected, actual in zip(reference[2], candidate[2]):
+        if expected != actual:
+            lines.append(f"flag {expected[0]}: {expected[1:]} != {actual[1:]}")
+    if reference[3:] != candidate[3:]:
+        lines.append(f"win: {reference[3:]} != {candidate[3:]}")
+    return lines
+
+
+# runs reference and candidate World options on the same seeds in this process, e.g.
+# compare(range(100), {"event_driven": False}, {"event_driven": True}); returns the divergences
+def compare(seeds, reference_options, candidate_options, max_ticks=GOLDEN_MAX_TICKS):
+    divergences = []
+    for seed in seeds:
+        reference = run_trace(seed, max_ticks, **reference_options)
+        candidate = run_trace(seed, max_ticks, **candidate_options)
+        index = first_divergence(reference, candidate)
+        if index is not None:
+            divergences.append(_divergence(seed, reference, candidate, index))
+    return divergences
+
+
+def _divergence(seed, reference, candidate, index):
+    tick = min(trace[index][0] for trace in (reference, candidate) if index < len(trace))
+    return {"seed": seed, "tick": tick, "diff": state_diff(state_at(reference, tick), state_at(candidate, tick))}
+
+
+# golden file of the current tree: per seed the (tick, digest) trace, compact enough for hundreds of seeds
+def record(path, seeds, max_ticks=GOLDEN_MAX_TICKS, workers=1):
+    traces = _map(_digest_trace, [(seed, max_ticks) for seed in seeds], workers)
+    with open(path, "w") as golden_file:
+        json.dump({"max_ticks": max_ticks, "traces": {str(seed): trace for seed, trace in zip(seeds, traces)}}, golden_file)
+
+
+# compares the current tree against a golden file; with the reference tree's directory the first
+# divergent state is replayed there to report a diff instead of only the tick
+def check(path, reference_directory=None, workers=1):
+    with open(path) as golden_file:
+        golden = json.load(golden_file)
+    seeds = [int(seed) for seed in golden["traces"]]
+    traces = _map(_digest_trace, [(seed, golden["max_ticks"]) for seed in seeds], workers)
+
+    divergences = []
+    for seed, candidate in zip(seeds, traces):
+        reference = golden["traces"][str(seed)]
+        index = first_divergence(reference, candidate, key=tuple)
+        if index is None:
+            continue
+        tick = min(trace[index][0] for trace in (reference, candidate) if index < len(trace))
+        divergence = {"seed": seed, "tick": tick, "diff": []}
+        if reference_directory is not None:
+            reference_state = _replay(reference_directory, seed, golden["max_ticks"], tick)
+            candidate_state = state_at(run_trace(seed, golden["max_ticks"]), tick)
+            divergence["diff"] = state_diff(reference_state, candidate_state)
+        divergences.append(divergence)
+    return len(seeds), divergences
+
+
+def _digest_trace(job):
+    seed, max_ticks = job
+    return [[tick, digest(state)] for tick, state in run_trace(seed, max_ticks)]
+
+
+# the agents keep their knowledge base in the working directory, so every worker gets its own
+def _worker_init():
+    os.chdir(tempfile.mkdtemp(prefix="golden-"))
+
+
+def _map(function, jobs, workers):
+    if workers <= 1:
+        return [function(job) for job in jobs]
+    with multiprocessing.Pool(workers, initializer=_worker_init) as pool:
+        return pool.map(function, jobs)
+
+
+def _replay(directory, seed, max_ticks, tick):
+    command = [sys.executable, os.path.join(directory, "golden.py"), "state", str(seed), str(tick), "--max-ticks", str(max_ticks)]
+    output = subprocess.run(command, cwd=tempfile.mkdtemp(prefix="golden-"), capture_output=True, text=True, check=True).stdout
+    return ast.literal_eval(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="golden-trace equivalence of seeded matches")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="write the traces of this tree to a golden file")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--seeds", type=int, default=GOLDEN_SEEDS)
+    record_parser.add_argument("--max-ticks", type=int, default=GOLDEN_MAX_TICKS)
+    record_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    check_parser = commands.add_parser("check", help="compare this tree against a golden file")
+    check_parser.add_argument("path")
+    check_parser.add_argument("--reference", help="directory of the tree the golden file was recorded from, for diffs")
+    check_parser.add_argument("--workers", type=int, default=os.cpu_count())
+    state_parser = commands.add_parser("state", help="print the trace state of a seed at a tick")
+    state_parser.add_argument("seed", type=int)
+    state_parser.add_argument("tick", type=int)
+    state_parser.add_argument("--max-ticks", type=int, default=GOLDEN_MAX_TICKS)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        record(args.path, list(range(args.seeds)), args.max_ticks, args.workers)
+        print(f"\nrecorded {args.seeds} seeds to {args.path}\n")
+    elif args.command == "check":
+        matches, divergences = check(args.path, args.reference, args.workers)
+        for divergence in divergences:
+            print(f"seed {divergence['seed']}: first divergence at tick {divergence['tick']}")
+            for line in divergence["diff"]:
+                print(f"    {line}")
+        print(f"\n{matches - len(divergences)} of {matches} seeds match\n")
+        sys.exit(1 if divergences else 0)
+    else:
+        print(repr(state_at(run_trace(args.seed, args.max_ticks), args.tick)))
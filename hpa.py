@@ -0,0 +1,203 @@
+import heapq
+
+
+# hierarchical path planner (HPA*) over a grid of tiles, positions are (row, col) like the agents use
+#
+# the grid is split into cluster_size x cluster_size clusters; every maximal run of open cells along a
+# border between two clusters gets one entrance (a pair of cells, one on each side). Costs between the
+# entrances of a cluster are precomputed with local searches. sync() only marks clusters whose cells
+# changed, and they are rebuilt lazily before the next query
+class HierarchicalPlanner:
+
+    def __init__(self, tile_cost, blocked_cost, cluster_size=10):
+        self.tile_cost = tile_cost
+        self.blocked_cost = blocked_cost
+        self.cluster_size = cluster_size
+
+        self.grid = None
+        self.rows = 0
+        self.cols = 0
+        self.dirty = set()
+        self.borders = {}      # (cluster, cluster) -> [(cell, cell), ...] entrance pairs
+        self.intra = {}        # cluster -> {node: {node: cost}}
+        self.nodes = {}        # cluster -> set of entrance cells inside the cluster
+        self.inter = {}        # node -> {node in the neighbouring cluster: cost}
+
+    def sync(self, grid):
+        if self.grid is None or len(grid) != self.rows or len(grid[0]) != self.cols:
+            self.grid = [list(row) for row in grid]
+            self.rows, self.cols = len(grid), len(grid[0])
+            self.borders, self.intra, self.nodes, self.inter = {}, {}, {}, {}
+            self.dirty = {(r, c) for r in range(self._clusters(self.rows)) for c in range(self._clusters(self.cols))}
+            return
+        for row in range(self.rows):
+            if grid[row] == self.grid[row]:
+                continue
+            for col in range(self.cols):
+                if grid[row][col] != self.grid[row][col]:
+                    self.grid[row][col] = grid[row][col]
+                    self.dirty.add(self.cluster_of((row, col)))
+
+    # path from start towards goal, refined only up to the first entrance on the way (or to the goal
+    # when it is in the same cluster); empty when the goal can not be reached through open cells
+    def find_path(self, start, goal):
+        self._refresh()
+        if start == goal:
+            return [start]
+        start_cluster = self.cluster_of(start)
+        goal_cluster = self.cluster_of(goal)
+
+        start_cost, start_parent = self._local_search(start, start_cluster, goal)
+        if start_cluster == goal_cluster and goal in start_cost:
+            return self._trace(start_parent, goal)
+
+        goal_cost, goal_parent = self._local_search(goal, goal_cluster, start, reverse=True)
+        start_links = {node: start_cost[node] for node in self.nodes.get(start_cluster, ()) if node in start_cost}
+        goal_links = {node: goal_cost[node] for node in self.nodes.get(goal_cluster, ()) if node in goal_cost}
+
+        first_node = self._abstract_search(start, goal, start_links, goal_links)
+        if first_node is None:
+            return []
+        if first_node not in start_parent:
+            # start is an entrance itself and the route crosses straight into the neighbouring cluster
+            return [start, first_node]
+        return self._trace(start_parent, first_node)
+
+    def cluster_of(self, position):
+        return position[0] // self.cluster_size, position[1] // self.cluster_size
+
+    def _clusters(self, cells):
+        return (cells + self.cluster_size - 1) // self.cluster_size
+
+    def _bounds(self, cluster):
+        top, left = cluster[0] * self.cluster_size, cluster[1] * self.cluster_size
+        return top, left, min(top + self.cluster_size, self.rows), min(left + self.cluster_size, self.cols)
+
+    def _cost(self, position):
+        return self.tile_cost(self.grid[position[0]][position[1]])
+
+    def _open(self, position):
+        return self._cost(position) < self.blocked_cost
+
+    def _refresh(self):
+        if not self.dirty:
+            return
+        changed = set(self.dirty)
+        for cluster in self.dirty:
+            row, col = cluster
+            for neighbour in ((row, col + 1), (row + 1, col), (row, col - 1), (row - 1, col)):
+                if 0 <= neighbour[0] < self._clusters(self.rows) and 0 <= neighbour[1] < self._clusters(self.cols):
+                    border = (min(cluster, neighbour), max(cluster, neighbour))
+                    if self._rebuild_border(border):
+                        changed.add(neighbour)
+        for cluster in changed:
+            self._rebuild_cluster(cluster)
+        self.dirty = set()
+
+    # returns True when the entrances on this border changed
+    def _rebuild_border(self, border):
+        (row_a, col_a), (row_b, col_b) = border
+        top, left, bottom, right = self._bounds(border[0])
+        if row_a == row_b:
+            pairs = [((row, right - 1), (row, right)) for row in range(top, bottom)]
+        else:
+            pairs = [((bottom - 1, col), (bottom, col)) for col in range(left, right)]
+
+        entrances = []
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and self._open(pair[0]) and self._open(pair[1]):
+                run.append(pair)
+            elif run:
+                entrances.append(run[len(run) // 2])
+                run = []
+
+        old = self.borders.get(border, [])
+        for cell_a, cell_b in old:
+            self.inter.get(cell_a, {}).pop(cell_b, None)
+            self.inter.get(cell_b, {}).pop(cell_a, None)
+        # costs of crossing are refreshed even when the entrances stay, the entered cell may have changed
+        for cell_a, cell_b in entrances:
+            self.inter.setdefault(cell_a, {})[cell_b] = self._cost(cell_b)
+            self.inter.setdefault(cell_b, {})[cell_a] = self._cost(cell_a)
+        self.borders[border] = entrances
+        return old != entrances
+
+    def _rebuild_cluster(self, cluster):
+        nodes = set()
+        row, col = cluster
+        for neighbour in ((row, col + 1), (row + 1, col), (row, col - 1), (row - 1, col)):
+            border = (min(cluster, neighbour), max(cluster, neighbour))
+            side = border.index(cluster)
+            nodes.update(pair[side] for pair in self.borders.get(border, ()))
+        for node in self.nodes.get(cluster, ()):
+            if node not in nodes:
+                self.inter.pop(node, None)
+        self.nodes[cluster] = nodes
+        self.intra[cluster] = {}
+        for node in nodes:
+            cost, _ = self._local_search(node, cluster)
+            self.intra[cluster][node] = {other: cost[other] for other in nodes if other != node and other in cost}
+
+    # Dijkstra restricted to one cluster; reverse gives costs *to* source instead of *from* it
+    def _local_search(self, source, cluster, target=None, reverse=False):
+        top, left, bottom, right = self._bounds(cluster)
+        cost = {source: 0}
+        parent = {source: None}
+        open_set = [(0, source)]
+        while open_set:
+            current_cost, current = heapq.heappop(open_set)
+            if current_cost > cost[current]:
+                continue
+            row, col = current
+            for neighbour in ((row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)):
+                if not (top <= neighbour[0] < bottom and left <= neighbour[1] < right):
+                    continue
+                if neighbour != target and not self._open(neighbour):
+                    continue
+                step = self._cost(current) if reverse else self._cost(neighbour)
+                if step >= self.blocked_cost:
+                    step = 0  # only the start or goal cell itself can be blocked
+                if neighbour not in cost or current_cost + step < cost[neighbour]:
+                    cost[neighbour] = current_cost + step
+                    parent[neighbour] = current
+                    heapq.heappush(open_set, (cost[neighbour], neighbour))
+        return cost, parent
+
+    # A* over the entrance graph, returns the first waypoint after start on the cheapest route
+    def _abstract_search(self, start, goal, start_links, goal_links):
+        def heuristic(position):
+            return abs(position[0] - goal[0]) + abs(position[1] - goal[1])
+
+        cost = {start: 0}
+        first = {start: None}
+        open_set = [(heuristic(start), 0, start)]
+        while open_set:
+            _, current_cost, current = heapq.heappop(open_set)
+            if current == goal:
+                return first[goal]
+            if current_cost > cost[current]:
+                continue
+            if current == start:
+                edges = dict(start_links)
+                edges.update(self.inter.get(start, {}))
+            else:
+                edges = dict(self.intra.get(self.cluster_of(current), {}).get(current, {}))
+                edges.update(self.inter.get(current, {}))
+                if current in goal_links:
+                    edges[goal] = goal_links[current]
+            for neighbour, step in edges.items():
+                new_cost = current_cost + step
+                if neighbour not in cost or new_cost < cost[neighbour]:
+                    cost[neighbour] = new_cost
+                    first[neighbour] = neighbour if current == start else first[current]
+                    heapq.heappush(open_set, (new_cost + heuristic(neighbour), new_cost, neighbour))
+        return None
+
+    @staticmethod
+    def _trace(parent, end):
+        path = []
+        while end is not None:
+            path.append(end)
+            end = parent[end]
+        return path[::-1]
@@ -0,0 +1,89 @@
+from tournament import play_match
+from agents import REGISTRY
+from config import *
+
+import argparse
+import contextlib
+import io
+import math
+
+
+# Elo league over the registered agents
+#
+# instead of a full round robin the next pairing is the one with the most uncertain result
+# (win probability closest to 0.5) between agents that have played the fewest matches so far
+class League:
+
+    def __init__(self, names=None, initial=ELO_INITIAL, k=ELO_K):
+        self.names = sorted(names if names is not None else REGISTRY)
+        if len(self.names) < 2:
+            raise ValueError("a league needs at least two agents")
+        self.k = k
+        self.ratings = {name: float(initial) for name in self.names}
+        self.played = {name: 0 for name in self.names}
+        self.pairs = {}     # (name, name) -> matches played between them
+        self.results = {name: [0, 0, 0] for name in self.names}    # wins, ties, losses
+
+    def expected(self, a, b):
+        return 1 / (1 + 10 ** ((self.ratings[b] - self.ratings[a]) / 400))
+
+    # value of playing a against b next: outcome uncertainty, scaled down the more both have played
+    # and the more often this exact pairing was already seen
+    def information(self, a, b):
+        p = self.expected(a, b)
+        uncertainty = 1 / math.sqrt(1 + self.played[a]) + 1 / math.sqrt(1 + self.played[b])
+        return p * (1 - p) * uncertainty / (1 + self.pairs.get((min(a, b), max(a, b)), 0))
+
+    # (blue, red) of the most informative pairing, colors alternate between repeats of a pairing
+    def next_pairing(self):
+        best = None
+        for i, a in enumerate(self.names):
+            for b in self.names[i + 1:]:
+                value = self.information(a, b)
+                if best is None or value > best[0]:
+                    best = (value, a, b)
+        _, a, b = best
+        return (a, b) if self.pairs.get((a, b), 0) % 2 == 0 else (b, a)
+
+    def record(self, blue, red, win):
+        score = 1.0 if win == "blue" else 0.0 if win == "red" else 0.5
+        change = self.k * (score - self.expected(blue, red))
+        self.ratings[blue] += change
+        self.ratings[red] -= change
+        for name in (blue, red):
+            self.played[name] += 1
+        pair = (min(blue, red), max(blue, red))
+        self.pairs[pair] = self.pairs.get(pair, 0) + 1
+        self.results[blue][0 if win == "blue" else 2 if win == "red" else 1] += 1
+        self.results[red][0 if win == "red" else 2 if win == "blue" else 1] += 1
+
+    def table(self):
+        return sorted(((self.ratings[name], name, self.played[name], *self.results[name]) for name in self.names), reverse=True)
+
+
+# plays matches between the most informative pairings, one seed per match
+def run_league(names=None, matches=LEAGUE_MATCHES, first_seed=0, quiet=True):
+    league = League(names)
+    for seed in range(first_seed, first_seed + matches):
+        blue, red = league.next_pairing()
+        if quiet:
+            with contextlib.redirect_stdout(io.StringIO()):
+                world = play_match(seed, blue_agent=blue, red_agent=red)
+        else:
+            world = play_match(seed, blue_agent=blue, red_agent=red)
+        league.record(blue, red, world.win)
+    return league
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="rank the registered agents with as few matches as possible")
+    parser.add_argument("agents", nargs="*", help="agent names, defaults to every registered agent")
+    parser.add_argument("--matches", type=int, default=LEAGUE_MATCHES)
+    parser.add_argument("--first-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    league = run_league(args.agents or None, args.matches, args.first_seed)
+    print(f"\n{'agent':<24}{'elo':>8}{'played':>8}{'W':>6}{'T':>6}{'L':>6}")
+    for rating, name, played, wins, ties, losses in league.table():
+        print(f"{name:<24}{rating:>8.0f}{played:>8}{wins:>6}{ties:>6}{losses:>6}")
+    print()
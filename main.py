@@ -1,4 +1,6 @@
 from tournament import World
+from memory_profile import format_report
+from decision_cache import format_stats
 from config import *
 import sys
 
@@ -72,21 +74,20 @@ def main():
     world.generate_world()
 
     while not world.win:
-        world.check_win_state()
-        world.buffer_worldmap()
-        if world.tick % 5 == 0:
-            world.update_agents()
-        else:
-            world.update_bullets()
-        world.iter()
+        world.step()
         #world.ascii_display()
-        handle_pygame(world)
+        with world.phase("rendering"):
+            handle_pygame(world)
     
     world.terminate_agents()
     
     if world.win == "tied":
-        print("\ntied!\n")
+        print(f"\ntied! ({world.win_reason})\n")
     else:
-        print(f"\n{world.win} won!\n")
+        print(f"\n{world.win} won! ({world.win_reason})\n")
+    if world.decision_cache_stats():
+        print(format_stats(world.decision_cache_stats()) + "\n")
+    if world.memory_report():
+        print(format_report(world.memory_report()) + "\n")
 
 main()
\ No newline at end of file
@@ -0,0 +1,162 @@
+from config import *
+
+from collections import deque
+
+
+NEIGHBOURS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+
+def is_floor(worldmap, x, y):
+    return 0 <= y < len(worldmap) and 0 <= x < len(worldmap[0]) and worldmap[y][x] != ASCII_TILES["wall"]
+
+
+# labels 4-connected floor regions, walls get label -1
+def label_components(worldmap):
+    height, width = len(worldmap), len(worldmap[0])
+    labels = [[-1] * width for _ in range(height)]
+    sizes = []
+    for y in range(height):
+        for x in range(width):
+            if labels[y][x] != -1 or worldmap[y][x] == ASCII_TILES["wall"]:
+                continue
+            label = len(sizes)
+            labels[y][x] = label
+            queue = deque([(x, y)])
+            size = 0
+            while queue:
+                cx, cy = queue.popleft()
+                size += 1
+                for dx, dy in NEIGHBOURS:
+                    nx, ny = cx + dx, cy + dy
+                    if is_floor(worldmap, nx, ny) and labels[ny][nx] == -1:
+                        labels[ny][nx] = label
+                        queue.append((nx, ny))
+            sizes.append(size)
+    return labels, sizes
+
+
+# breadth first distances from start over floor tiles, None where unreachable
+def distance_map(worldmap, start):
+    height, width = len(worldmap), len(worldmap[0])
+    distances = [[None] * width for _ in range(height)]
+    distances[start[1]][start[0]] = 0
+    queue = deque([start])
+    while queue:
+        cx, cy = queue.popleft()
+        for dx, dy in NEIGHBOURS:
+            nx, ny = cx + dx, cy + dy
+            if is_floor(worldmap, nx, ny) and distances[ny][nx] is None:
+                distances[ny][nx] = distances[cy][cx] + 1
+                queue.append((nx, ny))
+    return distances
+
+
+# articulation points of the floor graph (iterative Tarjan, safe for large maps)
+def choke_points(worldmap):
+    height, width = len(worldmap), len(worldmap[0])
+    discovery = [[-1] * width for _ in range(height)]
+    low = [[0] * width for _ in range(height)]
+    points = set()
+    counter = 0
+    for y in range(height):
+        for x in range(width):
+            if discovery[y][x] != -1 or worldmap[y][x] == ASCII_TILES["wall"]:
+                continue
+            discovery[y][x] = low[y][x] = counter
+            counter += 1
+            root_children = 0
+            stack = [((x, y), None, iter(NEIGHBOURS))]
+            while stack:
+                (cx, cy), parent, neighbours = stack[-1]
+                advanced = False
+                for dx, dy in neighbours:
+                    nx, ny = cx + dx, cy + dy
+                    if not is_floor(worldmap, nx, ny) or (nx, ny) == parent:
+                        continue
+                    if discovery[ny][nx] == -1:
+                        discovery[ny][nx] = low[ny][nx] = counter
+                        counter += 1
+                        if parent is None:
+                            root_children += 1
+                        stack.append(((nx, ny), (cx, cy), iter(NEIGHBOURS)))
+                        advanced = True
+                        break
+                    low[cy][cx] = min(low[cy][cx], discovery[ny][nx])
+                if advanced:
+                    continue
+                stack.pop()
+                if parent is not None:
+                    px, py = parent
+                    low[py][px] = min(low[py][px], low[cy][cx])
+                    if stack[-1][1] is not None and low[cy][cx] >= discovery[py][px]:
+                        points.add(parent)
+            if root_children > 1:
+                points.add((x, y))
+    return points
+
+
+# cheapest wall-breaking path (0-1 BFS) from start into any cell labeled target_label
+def _carve_path(worldmap, labels, start, target_label):
+    height, width = len(worldmap), len(worldmap[0])
+    cost = {start: 0}
+    came_from = {start: None}
+    queue = deque([start])
+    while queue:
+        current = queue.popleft()
+        cx, cy = current
+        if labels[cy][cx] == target_label:
+            while current is not None:
+                x, y = current
+                worldmap[y][x] = ASCII_TILES["empty"]
+                current = came_from[current]
+            return True
+        for dx, dy in NEIGHBOURS:
+            nx, ny = cx + dx, cy + dy
+            # keep the outer wall intact
+            if not (0 < nx < width - 1 and 0 < ny < height - 1):
+                continue
+            step = 1 if worldmap[ny][nx] == ASCII_TILES["wall"] else 0
+            if (nx, ny) not in cost or cost[current] + step < cost[(nx, ny)]:
+                cost[(nx, ny)] = cost[current] + step
+                came_from[(nx, ny)] = current
+                if step:
+                    queue.append((nx, ny))
+                else:
+                    queue.appendleft((nx, ny))
+    return False
+
+
+# makes every required position reachable from the first one, returns number of carved connections
+def repair_connectivity(worldmap, required_positions):
+    repairs = 0
+    labels, _ = label_components(worldmap)
+    main_label = labels[required_positions[0][1]][required_positions[0][0]]
+    for x, y in required_positions[1:]:
+        if labels[y][x] != main_label:
+            if not _carve_path(worldmap, labels, (x, y), main_label):
+                raise ValueError(f"position {(x, y)} can not be connected")
+            repairs += 1
+            labels, _ = label_components(worldmap)
+            main_label = labels[required_positions[0][1]][required_positions[0][0]]
+    return repairs
+
+
+# precomputed per-map data shared by the scheduler and analysis tools
+class MapInfo:
+
+    def __init__(self, worldmap, flag_positions, repairs=0):
+        self.repairs = repairs
+        self.components, self.component_sizes = label_components(worldmap)
+        self.choke_points = choke_points(worldmap)
+        self.flag_distance_maps = {color: distance_map(worldmap, position) for color, position in flag_positions.items()}
+
+        blue_distances = self.flag_distance_maps.get("blue")
+        red_x, red_y = flag_positions.get("red", (0, 0))
+        self.flag_distance = blue_distances[red_y][red_x] if blue_distances else None
+
+    def connected(self, pos1, pos2):
+        label = self.components[pos1[1]][pos1[0]]
+        return label != -1 and label == self.components[pos2[1]][pos2[0]]
+
+    def distance_to_flag(self, color, position):
+        return self.flag_distance_maps[color][position[1]][position[0]]
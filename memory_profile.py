@@ -0,0 +1,142 @@
+import contextlib
+import gc
+import os
+import time
+import tracemalloc
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+NO_PHASE = contextlib.nullcontext()
+# allocations of the profiler itself are left out of the snapshot diffs
+SNAPSHOT_FILTERS = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+PAGE_KB = os.sysconf("SC_PAGE_SIZE") // 1024 if hasattr(os, "sysconf") else 4
+
+
+# opt-in memory and GC instrumentation of one match
+#
+# per phase: calls, net bytes still allocated after it and the highest traced peak inside it, plus
+# the top allocation sites of every snapshot_every-th call. Across the match: GC collections and
+# pauses per generation and the highest RSS sampled at the phase boundaries, next to the peak RSS
+# of the whole process so far (which earlier matches may have set)
+class MemoryProfiler:
+
+    def __init__(self, snapshot_every=0, top=5):
+        self.snapshot_every = snapshot_every
+        self.top = top
+        self.phases = {}        # name -> [calls, net bytes, peak bytes]
+        self.phase_top = {}     # name -> [(site, bytes), ...] from the last snapshot diff
+        self.gc_collections = [0, 0, 0]
+        self.gc_pause = [0.0, 0.0, 0.0]
+        self.gc_max_pause = 0.0
+        self.frozen = 0
+        self.peak_rss_kb = None
+        self.started_tracing = False
+        self.gc_start = None
+        self.running = False
+
+    def start(self, freeze_static=False):
+        if freeze_static:
+            # everything allocated so far (map, visibility masks, agents) is never scanned again
+            gc.collect()
+            gc.freeze()
+            self.frozen = gc.get_freeze_count()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        gc.callbacks.append(self._on_gc)
+        self.running = True
+        self._sample_rss()
+
+    def stop(self):
+        if not self.running:
+            return
+        gc.callbacks.remove(self._on_gc)
+        if self.started_tracing:
+            tracemalloc.stop()
+        if self.frozen:
+            gc.unfreeze()
+        self.running = False
+
+    def phase(self, name):
+        return self._phase(name) if self.running else NO_PHASE
+
+    @contextlib.contextmanager
+    def _phase(self, name):
+        stats = self.phases.setdefault(name, [0, 0, 0])
+        stats[0] += 1
+        snapshot = self.snapshot_every and stats[0] % self.snapshot_every == 0
+        before = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS) if snapshot else None
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        yield
+        after, peak = tracemalloc.get_traced_memory()
+        stats[1] += after - current
+        stats[2] = max(stats[2], peak - current)
+        self._sample_rss()
+        if snapshot:
+            diff = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS).compare_to(before, "lineno")[:self.top]
+            self.phase_top[name] = [(str(stat.traceback), stat.size_diff) for stat in diff]
+
+    def _sample_rss(self):
+        rss = rss_kb()
+        if rss is not None:
+            self.peak_rss_kb = max(self.peak_rss_kb or 0, rss)
+
+    def _on_gc(self, event, info):
+        if event == "start":
+            self.gc_start = time.perf_counter()
+        elif self.gc_start is not None:
+            pause = time.perf_counter() - self.gc_start
+            self.gc_collections[info["generation"]] += 1
+            self.gc_pause[info["generation"]] += pause
+            self.gc_max_pause = max(self.gc_max_pause, pause)
+            self.gc_start = None
+
+    def report(self):
+        return {
+            "phases": {name: {"calls": calls, "net_bytes": net, "peak_bytes": peak}
+                       for name, (calls, net, peak) in self.phases.items()},
+            "top": self.phase_top,
+            "gc_collections": list(self.gc_collections),
+            "gc_pause_seconds": list(self.gc_pause),
+            "gc_max_pause_seconds": self.gc_max_pause,
+            "frozen_objects": self.frozen,
+            "peak_rss_kb": self.peak_rss_kb,
+            "process_peak_rss": process_peak_rss(),
+        }
+
+
+# current resident set size in kilobytes, None where /proc is missing (only linux has it)
+def rss_kb():
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * PAGE_KB
+    except OSError:
+        return None
+
+
+# peak resident set size of this process so far (kilobytes on linux, bytes on macOS), None where
+# the resource module is missing
+def process_peak_rss():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def format_report(report):
+    lines = [f"{'phase':<18}{'calls':>8}{'net KiB':>10}{'peak KiB':>10}"]
+    for name, stats in report["phases"].items():
+        lines.append(f"{name:<18}{stats['calls']:>8}{stats['net_bytes'] / 1024:>10.1f}{stats['peak_bytes'] / 1024:>10.1f}")
+    for name, sites in report["top"].items():
+        lines.append(f"top allocations in {name}:")
+        lines.extend(f"    {size / 1024:>8.1f} KiB  {site}" for site, size in sites)
+    lines.append(f"gc collections {report['gc_collections']}, pauses "
+                 f"{[round(pause * 1000, 2) for pause in report['gc_pause_seconds']]} ms "
+                 f"(max {report['gc_max_pause_seconds'] * 1000:.2f} ms), frozen objects {report['frozen_objects']}")
+    lines.append(f"peak rss {report['peak_rss_kb']} KiB in this match (sampled per phase), "
+                 f"{report['process_peak_rss']} for the process (ru_maxrss)")
+    return "\n".join(lines)
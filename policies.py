@@ -0,0 +1,17 @@
+import random
+
+
+# lightweight stateless brain for rollouts and tests, same interface as the agents in blue_agent.py / red_agent.py
+class RandomPolicy:
+
+    ACTIONS = ("move", "move", "move", "shoot")
+    DIRECTIONS = ("up", "down", "left", "right")
+
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def update(self, visible_world, position, can_shoot, holding_flag):
+        return self.random.choice(self.ACTIONS), self.random.choice(self.DIRECTIONS)
+
+    def terminate(self, reason):
+        pass
@@ -22,10 +22,13 @@ fictional example / ideas:
 
 
 from config import *
+from hpa import HierarchicalPlanner
+from cooperative import CooperativePlanner
 import random
 import json
 import heapq
 import math
+import time
 
 WALL_COST = 10000  
 CAPTURE_FLAG_COST = 0
@@ -37,14 +40,66 @@ SHOOTING_COST = 8
 
 ENEMY = "blue"
 MY = "red"
-MEMORY_FILE = MY + "_knowledge_base.json"
+
+# agents.load_agent calls this again when the module is loaded to play the other color
+def play_as(color):
+    global ENEMY, MY, MEMORY_FILE, TILE_COSTS, COST_CLASSES
+    MY = color
+    ENEMY = "red" if color == "blue" else "blue"
+    MEMORY_FILE = MY + "_knowledge_base.json"
+
+    TILE_COSTS = {
+        ASCII_TILES["empty"]: EMPTY_STEP_COST,
+        ASCII_TILES["wall"]: WALL_COST,
+        ASCII_TILES["bullet"]: WALL_COST,
+        ASCII_TILES["unknown"]: UNKNOWN_STEP_COST,
+        ASCII_TILES[ENEMY + "_agent"]: FEAR_OF_ENEMY,
+        ASCII_TILES[ENEMY + "_agent_f"]: FEAR_OF_ENEMY,
+        ASCII_TILES[MY + "_agent"]: EMPTY_STEP_COST, ## WALL_COST
+        ASCII_TILES[MY + "_agent_f"]: EMPTY_STEP_COST,
+        ASCII_TILES[ENEMY + "_flag"]: CAPTURE_FLAG_COST,
+        ASCII_TILES[MY + "_flag"]: WALL_COST,
+    }
+    # tiles of equal cost are the same to the planners, so the decision cache keys on these classes
+    costs = sorted(set(TILE_COSTS.values()))
+    COST_CLASSES = str.maketrans({tile: chr(ord("a") + costs.index(cost)) for tile, cost in TILE_COSTS.items()})
+
+play_as(MY)
 
 class Agent:
+
+    # the planned path depends only on the known map, the position and the target
+    DETERMINISTIC = True
+
+    # "astar", "hpa" or "cooperative", the engine sets the one of the match in seed
+    pathfinder = PATHFINDER
+    # hierarchical planner shared by the whole team, they share world_knowledge too
+    planner = None
+    # space-time reservations of the team, see cooperative.py
+    team_planner = None
+    # random stream of the team, seeded by the engine at the start of every match
+    rng = random.Random()
+    # agents per team in the current match, also set by the engine in seed
+    team_size = TEAM_SIZE
+    # set once the engine merges the team's view itself, see observe_team; the team's world_knowledge
+    # and target_positions then stay in memory instead of going through the knowledge base file
+    team_observation = False
+    team_knowledge = None
+    edited_cells = set()  # (x, y) cells agents committed changes to since the last team observation
     
     def __init__(self, color, index):
         self.color = color
         self.index = index
         self.positon = None
+        self.decision_cache = None
+        self.deadline = None  # perf_counter times set by the engine when decisions have a time budget
+        self.budget_end = None
+        self.commit_seconds = 0.0  # slowest recent knowledge base write and log, kept out of planning
+        type(self).team_observation = False  # until the engine sends one in this match
+        if self.pathfinder == "hpa" and Agent.planner is None:
+            Agent.planner = HierarchicalPlanner(TILE_COSTS.get, WALL_COST, HPA_CLUSTER_SIZE)
+        if self.pathfinder == "cooperative" and Agent.team_planner is None:
+            Agent.team_planner = CooperativePlanner(TILE_COSTS.get, WALL_COST, COOPERATIVE_WINDOW)
         self.knowledge_base = {
             "enemy_agent_positions": [],
             "enemy_flag_position": [],
@@ -55,10 +110,39 @@ class Agent:
         }
         self.write_knowledge_base()
 
+    # every match starts with fresh planners, the agents create them for the match's pathfinder
+    @classmethod
+    def seed(cls, value, team_size=TEAM_SIZE, pathfinder=PATHFINDER):
+        cls.rng.seed(value)
+        cls.team_size = team_size
+        cls.pathfinder = pathfinder
+        cls.planner = None
+        cls.team_planner = None
+
+    # everything the team sees this tick (cells) and what changed since its last view, merged into the
+    # team's world_knowledge once for all agents. Only changed cells and the seen cells agents edited
+    # since are written, which leaves the same map as writing every seen cell
+    @classmethod
+    def observe_team(cls, cells, changed):
+        if not cls.team_observation:
+            cls.team_observation = True
+            with open(MEMORY_FILE, "r") as openfile:
+                knowledge_base = json.load(openfile)
+            cls.team_knowledge = {"world_knowledge": knowledge_base["world_knowledge"], "target_positions": knowledge_base["target_positions"]}
+            cls.edited_cells = set()
+        world_knowledge = cls.team_knowledge["world_knowledge"]
+        updates = list(changed.items()) + [(cell, cells[cell]) for cell in cls.edited_cells if cell in cells]
+        for (x, y), tile in updates:
+            if tile != ASCII_TILES["unknown"] and 1 <= x <= len(world_knowledge[0]) and 1 <= y <= len(world_knowledge):
+                world_knowledge[y - 1][x - 1] = tile
+        cls.edited_cells = set()
+
     def update(self, visible_world, position, can_shoot, holding_flag):
         # Update knowledge base based on visible_world and other parameters
         position = (position[1] - 1, position[0] - 1)
         self.position = position
+        if self.budget_end is not None:
+            self.deadline = min(self.deadline, self.budget_end - self.commit_seconds)
         self.update_world_knowledge(visible_world, position)
         self.update_enemy_agent_positions(visible_world, position)
         self.update_enemy_flag_position(visible_world, position)
@@ -68,11 +152,18 @@ class Agent:
         # Make a decision based on agent world knowledge
         action, direction = self.make_decision(can_shoot, holding_flag, position, self.knowledge_base["world_knowledge"], visible_world)
 
+        # a decision that would end past the budget is dropped by the engine, so it must not reach the
+        # team's knowledge base either; standing still is what the engine falls back to
+        commit_start = time.perf_counter()
+        if self.budget_end is not None and commit_start + self.commit_seconds > self.budget_end:
+            return None, None
         self.write_knowledge_base()
         print(self.knowledge_base["enemy_flag_position"])
         print("index: " + str(self.index) + "   current pos: " + str(position) + "    target pos: " + 
               str(self.knowledge_base["target_positions"].get(str(self.index) + "_pos")) +
               "     move: " + str(action) + "    direciton: " + str(direction))
+        if self.budget_end is not None:
+            self.commit_seconds = max(self.commit_seconds * 0.9, time.perf_counter() - commit_start)
         return action, direction
 
     def make_decision(self, can_shoot, holding_flag, current_position, world_knowledge, visible_world):
@@ -88,13 +179,22 @@ class Agent:
                    target_position = self.knowledge_base["enemy_flag_position"][0]
                    target_sign = ASCII_TILES[ENEMY + "_flag"]
                 else:
+                    # farthest unknown cells, past the deadline only the ones scanned so far are considered
                     unknown = self.get_positions_from_world_knowledge(ASCII_TILES["unknown"])
-                    distance = [abs(pos[0]-current_position[0]) + abs(pos[1]-current_position[1]) +
-                                abs(pos[0]-self.knowledge_base["my_flag_position"][0][0]) + 
-                                abs(pos[1]-self.knowledge_base["my_flag_position"][0][1])
-                                for pos in unknown]
-                    indices = [i for i, x in enumerate(distance) if x == max(distance)]
-                    target_position = unknown[random.choice(indices)]
+                    my_flag = self.knowledge_base["my_flag_position"][0]
+                    farthest = []
+                    max_distance = -1
+                    for i, pos in enumerate(unknown):
+                        if i % 64 == 63 and self.past_deadline():
+                            break
+                        distance = abs(pos[0]-current_position[0]) + abs(pos[1]-current_position[1]) + \
+                                   abs(pos[0]-my_flag[0]) + abs(pos[1]-my_flag[1])
+                        if distance > max_distance:
+                            max_distance = distance
+                            farthest = [pos]
+                        elif distance == max_distance:
+                            farthest.append(pos)
+                    target_position = self.rng.choice(farthest)
                     target_sign = ASCII_TILES["unknown"]
             return target_position, target_sign
         
@@ -118,10 +218,42 @@ class Agent:
             self.knowledge_base["target_positions"][str(self.index) + "_pos"] = target_position
             self.knowledge_base["target_positions"][str(self.index) + "_sign"] = target_sign
         
-        shortest_path = self.astar(current_position, target_position, world_knowledge)
-        if len(shortest_path) > 0:
-            action, direction = self.get_action_and_direction(current_position, shortest_path, can_shoot, visible_world)
-        return action, direction
+        # no path (e.g. the target is walled in by teammates) falls through to a random move
+        shortest_path = self.cached_plan_path(current_position, target_position, world_knowledge)
+        return self.get_action_and_direction(current_position, shortest_path, can_shoot, visible_world)
+
+    # only the first step of the path is used, so that is what gets cached; cooperative paths depend on
+    # the teammates' reservations and paths cut short by the deadline are partial, neither is cached
+    def cached_plan_path(self, agent_pos, target_pos, world_knowledge):
+        if self.decision_cache is None or self.team_planner is not None:
+            return self.plan_path(agent_pos, target_pos, world_knowledge)
+
+        key = self.decision_cache.key(world_knowledge, COST_CLASSES, agent_pos, target_pos)
+        first_step = self.decision_cache.lookup(key)
+        if first_step is not None:
+            return list(first_step)
+        path = self.plan_path(agent_pos, target_pos, world_knowledge)
+        if not self.past_deadline():
+            self.decision_cache.store(key, tuple(path[:2]))
+        return path
+
+    def past_deadline(self):
+        return self.deadline is not None and time.perf_counter() > self.deadline
+
+    # the hierarchical path only reaches the first entrance on the way and the cooperative one the end
+    # of its window, which is all one tick needs; plain astar is the fallback when the target is
+    # behind walls or unknown-blocked cells
+    def plan_path(self, agent_pos, target_pos, world_knowledge):
+        if self.team_planner is not None:
+            path = self.team_planner.plan(self, agent_pos, target_pos, world_knowledge)
+            if path:
+                return path
+        elif self.planner is not None:
+            self.planner.sync(world_knowledge)
+            path = self.planner.find_path(agent_pos, target_pos)
+            if path:
+                return path
+        return self.astar(agent_pos, target_pos, world_knowledge)
 
     def astar(self, agent_pos, target_pos, world_knowledge):
         def is_valid(position):
@@ -149,22 +281,7 @@ class Agent:
 
         def cost_from_const(pos, world_knowledge):
             x, y = pos
-            if world_knowledge[x][y] == ASCII_TILES["empty"]:
-                return EMPTY_STEP_COST  
-            elif world_knowledge[x][y] == ASCII_TILES["wall"]:
-                return WALL_COST
-            elif world_knowledge[x][y] == ASCII_TILES["bullet"]:
-                return WALL_COST
-            elif world_knowledge[x][y] == ASCII_TILES["unknown"]:
-                return UNKNOWN_STEP_COST 
-            elif world_knowledge[x][y] == ASCII_TILES[ENEMY + "_agent"] or world_knowledge[x][y] == ASCII_TILES[ENEMY + "_agent_f"]:
-                return FEAR_OF_ENEMY
-            elif world_knowledge[x][y] == ASCII_TILES[MY + "_agent"] or world_knowledge[x][y] == ASCII_TILES[MY + "_agent_f"]:
-                return EMPTY_STEP_COST ## WALL_COST
-            elif world_knowledge[x][y] == ASCII_TILES[ENEMY + "_flag"] :
-                return CAPTURE_FLAG_COST
-            elif world_knowledge[x][y] == ASCII_TILES[MY + "_flag"] :
-                return WALL_COST
+            return TILE_COSTS.get(world_knowledge[x][y])
 
         start = agent_pos
         goal = target_pos
@@ -172,12 +289,19 @@ class Agent:
         heapq.heappush(open_set, (0, start))
         came_from = {start: None}
         g_cost = {start: 0}
+        # anytime: past the deadline the path to the expanded cell closest to the goal is returned
+        closest = (heuristic(start, goal), start)
+        expanded = 0
 
         while open_set:
             _, current_pos = heapq.heappop(open_set)
 
             if current_pos == goal:
                 return return_path(came_from, start, goal)
+            closest = min(closest, (heuristic(current_pos, goal), current_pos))
+            expanded += 1
+            if expanded % 32 == 0 and self.past_deadline():
+                return return_path(came_from, start, closest[1])
 
             neighbors = generate_neighbors(current_pos)
             for neighbor in neighbors:
@@ -195,30 +319,23 @@ class Agent:
         else: 
             return []
 
-    def get_action_and_direction(self, current_pos, shortest_path, can_shoot, visible_world):
-        def no_walls_between_positions(pos1, pos2):
-            if pos1[0] == pos2[0]:
-                start_col = min(pos1[1], pos2[1])
-                end_col = max(pos1[1], pos2[1])
-                return all(self.knowledge_base["world_knowledge"][pos1[0]][col] != ASCII_TILES["wall"] for col in range(start_col, end_col))
-            elif pos1[1] == pos2[1]:
-                start_row = min(pos1[0], pos2[0])
-                end_row = max(pos1[0], pos2[0])
-                return all(self.knowledge_base["world_knowledge"][row][pos1[1]] != ASCII_TILES["wall"] for row in range(start_row, end_row))
-            else:
-                return False
-        
-        def direction_towards_enemy(current_pos):
-            directions = {"row": [], "col": []}
-            visible_enemies = self.get_positions_from_visible_world(visible_world, current_pos, ASCII_TILES[ENEMY + "_agent"]) + \
-                self.get_positions_from_visible_world(visible_world, current_pos, ASCII_TILES[ENEMY + "_agent_f"])
-            for pos in visible_enemies:
-                if pos[0] == current_pos[0] and no_walls_between_positions(current_pos, pos):
-                    directions["row"].append("right" if pos[1] > current_pos[1] else "left")
-                elif pos[1] == current_pos[1] and no_walls_between_positions(current_pos, pos):
-                    directions["col"].append("down" if pos[0] > current_pos[0] else "up")
-            return directions
+    # range of the nearest enemy with a clear line of fire in each direction, one walk out from the window centre
+    def lines_of_fire(self, visible_world):
+        enemy_tiles = (ASCII_TILES[ENEMY + "_agent"], ASCII_TILES[ENEMY + "_agent_f"])
+        blocking_tiles = (ASCII_TILES["wall"], ASCII_TILES["unknown"])
+        center = len(visible_world) // 2
+        ranges = {}
+        for direction, (d_row, d_col) in (("left", (0, -1)), ("right", (0, 1)), ("up", (-1, 0)), ("down", (1, 0))):
+            for distance in range(1, center + 1):
+                tile = visible_world[center + d_row * distance][center + d_col * distance]
+                if tile in enemy_tiles:
+                    ranges[direction] = distance
+                    break
+                if tile in blocking_tiles:
+                    break
+        return ranges
 
+    def get_action_and_direction(self, current_pos, shortest_path, can_shoot, visible_world):
         def move_towards_position(current_pos, next_pos):
             if next_pos[0] < current_pos[0]:
                 return 'move', 'up'
@@ -228,33 +345,27 @@ class Agent:
                 return 'move', 'left'
             elif next_pos[1] > current_pos[1]:
                 return 'move', 'right'
+            return None, None  # wait, a teammate has the next cell reserved
 
-        def shoot_towards_direction(directions):
-            if len(directions["col"]) == 0:
-                return 'shoot', directions["row"][0] if len(directions["row"]) > 0 else None
-            elif len(directions["row"]) == 0:
-                return 'shoot', directions["col"][0] if len(directions["col"]) > 0 else None
-            else:
-                return 'shoot', directions["row"][0]
-
-        directions = direction_towards_enemy(current_pos)
+        fire_ranges = self.lines_of_fire(visible_world)
 
         if len(shortest_path) > 1:
             next_pos = shortest_path[1]
 
-            if (len(directions["row"]) > 0 or len(directions["col"]) > 0) and can_shoot:
-                return shoot_towards_direction(directions)
+            if fire_ranges and can_shoot:
+                # shoot the closest enemy first, it is the most likely hit and the most dangerous
+                return 'shoot', min(fire_ranges, key=fire_ranges.get)
             else:
                 return move_towards_position(current_pos, next_pos)
         else:
-            return random.choice([('move', 'up'), ('move', 'down'), ('move', 'left'), ('move', 'right')])
+            return self.rng.choice([('move', 'up'), ('move', 'down'), ('move', 'left'), ('move', 'right')])
     
     def update_enemy_agent_positions(self, visible_world, position):
         memory_enemies = self.get_positions_from_world_knowledge(ASCII_TILES[ENEMY + "_agent"]) + \
             self.get_positions_from_world_knowledge(ASCII_TILES[ENEMY + "_agent_f"])
 
         if memory_enemies:
-            if len(memory_enemies) > 3:
+            if len(memory_enemies) > self.team_size:
                 visible_enemies = self.get_positions_from_visible_world(visible_world, position, ASCII_TILES[ENEMY + "_agent"]) + \
                     self.get_positions_from_visible_world(visible_world, position, ASCII_TILES[ENEMY + "_agent_f"])
 
@@ -307,6 +418,12 @@ class Agent:
                 self.knowledge_base["guarding_agent_position"] = memory_agents[1]
 
     def update_world_knowledge(self, visible_world, position):
+        # the engine already merged what the team sees, the agent works on a copy until it commits
+        if self.team_observation:
+            self.knowledge_base["world_knowledge"] = [row[:] for row in self.team_knowledge["world_knowledge"]]
+            self.knowledge_base["target_positions"] = dict(self.team_knowledge["target_positions"])
+            return
+
         # read latest knowledge base for max information
         with open(MEMORY_FILE, "r") as openfile:
             knowledge_base = json.load(openfile)
@@ -323,6 +440,10 @@ class Agent:
                     self.knowledge_base["world_knowledge"][y][x] = visible_world[j][i]
                     
     def write_knowledge_base(self):
+        if self.team_observation:
+            self.commit_team_knowledge()
+            return
+
         # Serializing json
         json_base = json.dumps(self.knowledge_base)
         
@@ -330,6 +451,17 @@ class Agent:
         with open(MEMORY_FILE, "w") as outfile:
             outfile.write(json_base)
 
+    # the agent's knowledge becomes the team's, with positions as lists like a round trip through the
+    # file leaves them; the cells it changed are noted for the next team observation
+    def commit_team_knowledge(self):
+        team_world_knowledge = self.team_knowledge["world_knowledge"]
+        for row, (mine, team) in enumerate(zip(self.knowledge_base["world_knowledge"], team_world_knowledge)):
+            if mine != team:
+                self.edited_cells.update((col + 1, row + 1) for col, tile in enumerate(mine) if tile != team[col])
+        self.team_knowledge["world_knowledge"] = [row[:] for row in self.knowledge_base["world_knowledge"]]
+        self.team_knowledge["target_positions"] = {key: list(value) if isinstance(value, tuple) else value
+                                                   for key, value in self.knowledge_base["target_positions"].items()}
+
     def get_positions_from_visible_world(self, visible_world, position, ascii_char):
         positions = []
         rows = [''.join(row) for row in visible_world]
@@ -0,0 +1,85 @@
+from tournament import play_match
+from config import *
+
+import argparse
+import contextlib
+import io
+import math
+
+
+# sequential probability ratio test on the decisive results of blue vs red
+#
+# H0: blue wins a decisive match with probability 0.5 - delta (red is better)
+# H1: blue wins a decisive match with probability 0.5 + delta (blue is better)
+# ties and adjudicated ties carry no information about which side is better and are only counted
+class SPRT:
+
+    def __init__(self, alpha=SPRT_ALPHA, beta=SPRT_BETA, delta=SPRT_DELTA):
+        self.p0 = 0.5 - delta
+        self.p1 = 0.5 + delta
+        self.upper = math.log((1 - beta) / alpha)
+        self.lower = math.log(beta / (1 - alpha))
+        self.llr = 0.0
+        self.wins = 0
+        self.ties = 0
+        self.losses = 0
+
+    def add(self, result):
+        if result == "blue":
+            self.wins += 1
+            self.llr += math.log(self.p1 / self.p0)
+        elif result == "red":
+            self.losses += 1
+            self.llr += math.log((1 - self.p1) / (1 - self.p0))
+        else:
+            self.ties += 1
+
+    def decision(self):
+        if self.llr >= self.upper:
+            return "blue"
+        if self.llr <= self.lower:
+            return "red"
+        return None
+
+
+# plays seeded matches of blue_agent vs red_agent until the SPRT decides or max_matches is reached
+def run_sequential(alpha=SPRT_ALPHA, beta=SPRT_BETA, delta=SPRT_DELTA, max_matches=SPRT_MAX_MATCHES, first_seed=0,
+                   blue_agent=BLUE_AGENT, red_agent=RED_AGENT, quiet=True):
+    test = SPRT(alpha, beta, delta)
+    matches = 0
+    while matches < max_matches and test.decision() is None:
+        if quiet:
+            with contextlib.redirect_stdout(io.StringIO()):
+                world = play_match(first_seed + matches, blue_agent=blue_agent, red_agent=red_agent)
+        else:
+            world = play_match(first_seed + matches, blue_agent=blue_agent, red_agent=red_agent)
+        test.add(world.win)
+        matches += 1
+
+    return {
+        "winner": test.decision() or "inconclusive",
+        "matches": matches,
+        "matches_saved": max_matches - matches,
+        "wins": test.wins,
+        "ties": test.ties,
+        "losses": test.losses,
+        "llr": test.llr,
+        "bounds": (test.lower, test.upper),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="blue vs red until the better side is statistically clear")
+    parser.add_argument("--blue", default=BLUE_AGENT, help="registered agent playing blue")
+    parser.add_argument("--red", default=RED_AGENT, help="registered agent playing red")
+    parser.add_argument("--alpha", type=float, default=SPRT_ALPHA)
+    parser.add_argument("--beta", type=float, default=SPRT_BETA)
+    parser.add_argument("--delta", type=float, default=SPRT_DELTA)
+    parser.add_argument("--max-matches", type=int, default=SPRT_MAX_MATCHES)
+    parser.add_argument("--first-seed", type=int, default=0)
+    args = parser.parse_args()
+
+    result = run_sequential(args.alpha, args.beta, args.delta, args.max_matches, args.first_seed, args.blue, args.red)
+    print(f"\n{args.blue} vs {args.red}: {result['winner']} after {result['matches']} matches "
+          f"({result['wins']}W {result['ties']}T {result['losses']}L, llr {result['llr']:.2f}), "
+          f"{result['matches_saved']} of {args.max_matches} matches saved\n")
@@ -1,6 +1,13 @@
-from blue_agent import Agent as B_agent
-from red_agent import Agent as R_agent
+from agents import load_agent
 from config import *
+from map_analysis import MapInfo, repair_connectivity
+from zobrist import ZobristHash, ZobristEntity
+from decision_cache import attach_cache, cache_stats
+from entity_store import EntityStore, stored
+from visibility import VisibilityCache
+from policies import RandomPolicy
+from decision_pool import DecisionPool, timed_decision
+from memory_profile import MemoryProfiler, NO_PHASE
 
 import time
 import random
@@ -9,19 +16,54 @@ import copy
 
 class World:
 
-    def __init__(self, height, width, tick_rate):
+    def __init__(self, height, width, tick_rate, max_ticks=MAX_TICKS, stalemate_repeats=STALEMATE_REPEATS, event_driven=EVENT_DRIVEN_TICKS,
+                 blue_agent=BLUE_AGENT, red_agent=RED_AGENT, team_size=TEAM_SIZE, decision_budget=DECISION_BUDGET,
+                 decision_workers=DECISION_WORKERS, dataset=None, team_observation=TEAM_OBSERVATION,
+                 memory_profile=MEMORY_PROFILE, pathfinder=PATHFINDER):
         self.height = height
         self.width = width
         self.tick_rate = tick_rate
+        self.team_size = team_size
+        self.pathfinder = pathfinder  # handed to the brains with the seed of every match
+        self.decision_budget = decision_budget
+        self.dataset = dataset  # dataset.DatasetWriter that records every decision
+        self.dataset_match = None
+        self.team_observation = team_observation
+        self.team_views = {}  # color -> cells the team saw on its last agent tick
+        self.profiler = MemoryProfiler(MEMORY_SNAPSHOT_EVERY) if memory_profile else None
+        self.tracer = None  # called after every tick, see golden.py
+        self.move_stats = {"moves": 0, "bounced": 0, "stacked": 0}  # stacked: agent ticks sharing a cell with a teammate
+        self.event_driven = event_driven
+        self.decision_pool = DecisionPool(decision_workers, DECISION_CACHE_SIZE) if decision_workers else None
+        self.worker_cache_stats = {}  # decision caches of the workers, collected before the pool closes
+        if self.decision_pool is not None:
+            self.brains = {"blue": self.decision_pool.brain(blue_agent, "blue"), "red": self.decision_pool.brain(red_agent, "red")}
+        else:
+            self.brains = {"blue": load_agent(blue_agent, "blue"), "red": load_agent(red_agent, "red")}
+        self.max_ticks = max_ticks
+        self.stalemate_repeats = stalemate_repeats
         
         self.tick = 0
         self.worldmap = None
         self.worldmap_buffer = None
         self.win = ""
+        self.win_reason = ""
+        self.zobrist = ZobristHash()
+        self.state_counts = {}
+        self.state_counts_shared = False
+        self.max_state_repeats = 0
+        self.map_info = None
+        self.visibility = None
+        self.decision_times = {}  # (color, index) -> [calls, total seconds, worst seconds, overruns]
         
         self.agents = []
         self.flags = []
         self.bullets = []
+        self.flag_by_color = {}
+        self.alive_counts = {"blue": 0, "red": 0}
+        self.agent_store = EntityStore()
+        self.flag_store = EntityStore()
+        self.bullet_store = EntityStore()
     
     def _clear_area(self, x, y):
         for yi in [-1, 0, 1]:
@@ -66,6 +108,41 @@ class World:
                 self.worldmap[yi][WIDTH//2] = ASCII_TILES["empty"]
 
     def generate_world(self):
+        flag_positions, spawn_positions = self.generate_layout()
+        # every team draws from its own random stream, so decisions do not depend on where they run;
+        # the team size and pathfinder of the match go along, brains can not read them from the config
+        for color in ("blue", "red"):
+            if hasattr(self.brains[color], "seed"):
+                self.brains[color].seed(random.getrandbits(32), team_size=self.team_size, pathfinder=self.pathfinder)
+        for color, position in flag_positions:
+            self.flags.append( Flag(color, position, self.flag_store) )
+            self.flag_by_color[color] = self.flags[-1]
+        for color, position in spawn_positions:
+            self.agents.append( AgentEngine(color, position, self.agent_store, self.brains[color]) )
+            self.alive_counts[color] += 1
+
+        for entity in self.flags + self.agents:
+            self.zobrist.attach(entity)
+        if self.dataset is not None:
+            self.dataset_match = self.dataset.begin_match()
+        if self.profiler is not None:
+            self.profiler.start(MEMORY_FREEZE_STATIC)
+
+    # a World with only what generate_layout needs, no brains, worker pool or profiler; for callers
+    # that only want maps, see vec_env
+    @classmethod
+    def layout_only(cls, height, width, team_size=TEAM_SIZE):
+        world = cls.__new__(cls)
+        world.height = height
+        world.width = width
+        world.team_size = team_size
+        world.worldmap = None
+        world.map_info = None
+        world.visibility = None
+        return world
+
+    # builds the worldmap and returns (color, position) pairs for flags and agent spawns
+    def generate_layout(self):
         self.worldmap = [[ASCII_TILES["empty"] for _ in range(self.width)] for _ in range(self.height)]
 
         for y in range(len(self.worldmap)):
@@ -78,30 +155,52 @@ class World:
         flag_x = random.randint(3, 5)
         flag_y = random.randint(4, self.height - 5)
         flag_blue_pos = (flag_x, flag_y)
-        self._clear_area(flag_x, flag_y)
-        self.flags.append( Flag("blue", (flag_x, flag_y)) )
-
-        self.agents.append( AgentEngine("blue", (flag_x + 2, flag_y)) )
-        self._clear_area(flag_x + 2, flag_y)
-        self.agents.append( AgentEngine("blue", (flag_x, flag_y + 2)) )
-        self._clear_area(flag_x, flag_y + 2)
-        self.agents.append( AgentEngine("blue", (flag_x, flag_y - 2)) )
-        self._clear_area(flag_x, flag_y - 2)
+        spawn_positions = [("blue", position) for position in self._spawn_layout(flag_blue_pos, 1)]
 
         flag_x = random.randint(self.width - 6, self.width - 4)
         flag_y = random.randint(4, self.height - 5)
         flag_red_pos = (flag_x, flag_y)
-        self._clear_area(flag_x, flag_y)
-        self.flags.append( Flag("red", (flag_x, flag_y)) )
+        spawn_positions += [("red", position) for position in self._spawn_layout(flag_red_pos, -1)]
 
-        self.agents.append( AgentEngine("red", (flag_x - 2, flag_y)) )
-        self._clear_area(flag_x - 2, flag_y)
-        self.agents.append( AgentEngine("red", (flag_x, flag_y + 2)) )
-        self._clear_area(flag_x, flag_y + 2)
-        self.agents.append( AgentEngine("red", (flag_x, flag_y - 2)) )
-        self._clear_area(flag_x, flag_y - 2)
+        flag_positions = [("blue", flag_blue_pos), ("red", flag_red_pos)]
+        for _, position in flag_positions + spawn_positions:
+            self._clear_area(*position)
 
         self._clear_random_path(flag_blue_pos, flag_red_pos)
+        self._ensure_connectivity(flag_positions, spawn_positions)
+
+        self.visibility = VisibilityCache(self.worldmap, VISIBILITY_CACHE_SIZE)
+        if VISIBILITY_PRECOMPUTE:
+            self.visibility.precompute()
+        return flag_positions, spawn_positions
+
+    # team_size spawn cells around a flag on its own half of the map, facing is 1 for the left team
+    #
+    # the first three are the original spots in front of, below and above the flag, the rest follow by
+    # distance from the flag on a grid of every other cell so no two agents start on the same tile
+    def _spawn_layout(self, flag_position, facing):
+        flag_x, flag_y = flag_position
+        first = [(2 * facing, 0), (0, 2), (0, -2)]
+        rest = sorted(((dx, dy) for dx in range(-self.width, self.width + 1, 2) for dy in range(-self.height, self.height + 1, 2)
+                       if (dx, dy) != (0, 0) and (dx, dy) not in first),
+                      key=lambda offset: (abs(offset[0]) + abs(offset[1]), -offset[0] * facing, offset[1]))
+        spawns = []
+        for dx, dy in first + rest:
+            if len(spawns) == self.team_size:
+                break
+            x, y = flag_x + dx, flag_y + dy
+            own_half = x <= self.width // 2 - 2 if facing > 0 else x >= self.width // 2 + 2
+            if own_half and 2 <= x <= self.width - 3 and 2 <= y <= self.height - 3:
+                spawns.append((x, y))
+        if len(spawns) < self.team_size:
+            raise ValueError(f"a {self.width}x{self.height} map fits at most {len(spawns)} agents per team")
+        return spawns
+
+    # carves through walls until both flags and every spawn share one region
+    def _ensure_connectivity(self, flag_positions, spawn_positions):
+        required = [position for _, position in flag_positions + spawn_positions]
+        repairs = repair_connectivity(self.worldmap, required)
+        self.map_info = MapInfo(self.worldmap, dict(flag_positions), repairs)
 
     def buffer_worldmap(self):
         self.worldmap_buffer = copy.deepcopy(self.worldmap)
@@ -120,43 +219,248 @@ class World:
     def iter(self):
         time.sleep(self.tick_rate)
         self.tick += 1
+
+    # profiled section of a tick when memory profiling is on, e.g. `with world.phase("rendering"):`
+    def phase(self, name):
+        return self.profiler.phase(name) if self.profiler is not None else NO_PHASE
+
+    # one tick of the main loop
+    def step(self):
+        self.check_win_state()
+        with self.phase("buffer_worldmap"):
+            self.buffer_worldmap()
+        if self.tick % 5 == 0:
+            with self.phase("update_agents"):
+                self.update_agents()
+        else:
+            with self.phase("update_bullets"):
+                self.update_bullets()
+        self.iter()
+        if self.tracer is not None:
+            self.tracer()
+        if self.event_driven:
+            self.skip_idle_ticks()
+
+    # bullet ticks without bullets only check the win state, so they are run without the
+    # buffer copy, bullet update and sleep; tick numbers and results stay the same
+    def skip_idle_ticks(self):
+        while not self.win and not self.bullets and self.tick % 5 != 0:
+            self.check_win_state()
+            self.tick += 1
+            if self.tracer is not None:
+                self.tracer()
+
+    # fork for lookahead search: the static map, visibility and map info are shared, entity
+    # stores are copy-on-write and every agent brain is replaced by policy (RandomPolicy by default)
+    def clone(self, policy=None):
+        world = World.__new__(World)
+        world.__dict__.update(self.__dict__)
+        world.tick_rate = 0
+        world.decision_pool = None
+        world.dataset = None
+        world.profiler = None
+        world.tracer = None
+        world.move_stats = dict(self.move_stats)
+        world.brains = {}
+        world.zobrist = self.zobrist.fork()
+        world.state_counts_shared = self.state_counts_shared = True
+
+        mapping = {}
+        world.agent_store = self.agent_store.fork(mapping)
+        world.flag_store = self.flag_store.fork(mapping)
+        world.bullet_store = self.bullet_store.fork(mapping)
+        world.agents = [mapping[id(agent)] for agent in self.agents]
+        world.flags = [mapping[id(flag)] for flag in self.flags]
+        world.bullets = [mapping[id(bullet)] for bullet in self.bullets]
+        world.flag_by_color = {flag.color: flag for flag in world.flags}
+        world.alive_counts = dict(self.alive_counts)
+        world.decision_times = {key: list(times) for key, times in self.decision_times.items()}
+
+        policy = policy if policy is not None else RandomPolicy()
+        for entity in mapping.values():
+            if entity.zobrist is self.zobrist:
+                object.__setattr__(entity, "zobrist", world.zobrist)
+            if isinstance(entity, AgentEngine):
+                entity.agent = policy
+                if entity.holding_flag is not None:
+                    entity.holding_flag = mapping[id(entity.holding_flag)]
+            elif isinstance(entity, Flag) and entity.agent_holding is not None:
+                object.__setattr__(entity, "agent_holding", mapping[id(entity.agent_holding)])
+        return world
     
+    # every agent decides on the same buffer snapshot, then the decisions are applied in agent order
     def update_agents(self):
-        for agent in self.agents:
-            agent.control(self)
+        for agent, (action, direction) in zip(self.agents, self.decide(self.agents)):
+            agent.act(self, action, direction)
         for agent in self.agents:
             agent.collision(self)
             agent.update_can_shoot()
+        self.move_stats["stacked"] += len(self.agents) - len({(agent.color, agent.position) for agent in self.agents})
+        self._record_state()
     
     def update_bullets(self):
         for i in range(len(self.bullets)-1, -1, -1):
-            hit = self.bullets[i].update(self.worldmap_buffer, self.agents)
+            hit = self.bullets[i].update(self)
             if hit:
+                self.zobrist.detach(self.bullets[i])
+                self.bullet_store.release(self.bullets[i].slot)
                 del self.bullets[i]
+
+    def add_bullet(self, bullet):
+        self.zobrist.attach(bullet)
+        self.bullets.append(bullet)
+
+    # reuses a spent bullet from the free-list instead of allocating a new one
+    def spawn_bullet(self, agent, direction):
+        bullet = self.bullet_store.acquire()
+        if bullet is None:
+            bullet = Bullet(agent, direction, self.bullet_store)
+        else:
+            bullet.reset(agent, direction)
+        self.add_bullet(bullet)
     
+    # alive_counts is kept up to date when agents die, see Bullet._hit_agent
     def check_win_state(self):
-        blue_count = 0
-        red_count = 0
-        for agent in self.agents:
-            if agent.color == "blue":
-                blue_count += 1
-            elif agent.color == "red":
-                red_count += 1
+        blue_count = self.alive_counts["blue"]
+        red_count = self.alive_counts["red"]
         if blue_count == 0 and red_count == 0:
             self.win = "tied"
+            self.win_reason = "eliminated"
         elif red_count == 0:
             self.win = "blue"
+            self.win_reason = "eliminated"
         elif blue_count == 0:
             self.win = "red"
+            self.win_reason = "eliminated"
+        elif self.win:
+            pass
+        elif self.max_ticks and self.tick >= self.max_ticks:
+            self._adjudicate("timeout")
+        elif self.stalemate_repeats and self.max_state_repeats >= self.stalemate_repeats:
+            self._adjudicate("stalemate")
+
+    # fingerprint of agents, bullets, flag holders and shooting cooldowns
+    def state_hash(self):
+        return self.zobrist.value
+
+    # counts how often the same global state is reached after an agent tick
+    def _record_state(self):
+        if self.state_counts_shared:
+            self.state_counts = dict(self.state_counts)
+            self.state_counts_shared = False
+        key = self.state_hash()
+        self.state_counts[key] = self.state_counts.get(key, 0) + 1
+        self.max_state_repeats = max(self.max_state_repeats, self.state_counts[key])
+
+    # decides an unfinished match: more survivors first, then holding the enemy flag
+    def _adjudicate(self, reason):
+        score = {color: count * 2 for color, count in self.alive_counts.items()}
+        for flag in self.flags:
+            if flag.agent_holding:
+                score[flag.agent_holding.color] += 1
+        if score["blue"] > score["red"]:
+            self.win = "blue"
+        elif score["red"] > score["blue"]:
+            self.win = "red"
+        else:
+            self.win = "tied"
+        self.win_reason = reason
     
+    # with a decision budget the agents get a deadline to plan against (agents without a deadline
+    # attribute just ignore it) and a decision that still comes in late is replaced by FALLBACK_ACTION
+    def decide(self, agents):
+        if self.team_observation:
+            self.observe_teams(agents)
+        observations = [agent.observe(self) for agent in agents]
+        planning_time = self.decision_budget * AgentEngine.PLANNING_SHARE
+        if self.decision_pool is not None:
+            results = self.decision_pool.decide([agent.agent for agent in agents], observations, planning_time, self.decision_budget)
+        else:
+            results = [timed_decision(agent.agent, observation, planning_time, self.decision_budget)
+                       for agent, observation in zip(agents, observations)]
+
+        decisions = []
+        for agent, observation, (action, direction, elapsed) in zip(agents, observations, results):
+            self.record_decision_time(agent, elapsed)
+            if self.decision_budget and elapsed > self.decision_budget:
+                action, direction = AgentEngine.FALLBACK_ACTION
+            if self.dataset is not None:
+                self.dataset.record(self.dataset_match, self.tick, agent.color, observation, action, direction)
+            decisions.append((action, direction))
+        return decisions
+
+    # one fused observation per team and tick, handed to the brain class before its agents decide:
+    # every cell any teammate sees and the ones that changed since the team's previous observation
+    def observe_teams(self, agents):
+        for color in ("blue", "red"):
+            brain = self.brains.get(color)
+            positions = [agent.position for agent in agents if agent.color == color]
+            if not positions or not hasattr(brain, "observe_team"):
+                continue
+            cells = self.visibility.observe_team(self.worldmap_buffer, positions)
+            previous = self.team_views.get(color, {})
+            changed = {cell: tile for cell, tile in cells.items() if previous.get(cell) != tile}
+            self.team_views[color] = cells
+            brain.observe_team(cells, changed)
+
+    def record_decision_time(self, agent, elapsed):
+        times = self.decision_times.get((agent.color, agent.index))
+        if times is None:
+            times = self.decision_times[(agent.color, agent.index)] = [0, 0.0, 0.0, 0]
+        times[0] += 1
+        times[1] += elapsed
+        times[2] = max(times[2], elapsed)
+        if self.decision_budget and elapsed > self.decision_budget:
+            times[3] += 1
+
+    def decision_time_stats(self):
+        return {f"{color} {index}": {"calls": calls, "mean": total / calls, "max": worst, "overruns": overruns}
+                for (color, index), (calls, total, worst, overruns) in sorted(self.decision_times.items())}
+
+    def decision_cache_stats(self):
+        stats = cache_stats(AgentEngine.decision_caches)
+        stats.update(self.decision_pool.cache_stats() if self.decision_pool is not None else self.worker_cache_stats)
+        return stats
+
     def terminate_agents(self):
         for agent in self.agents:
             agent.terminate(reason = self.win)
+        if self.decision_pool is not None:
+            self.worker_cache_stats = self.decision_pool.cache_stats()
+            self.decision_pool.close()
+            self.decision_pool = None
+        if self.dataset is not None:
+            self.dataset.end_match(self.dataset_match, self.win)
+        if self.profiler is not None:
+            self.profiler.stop()
+
+    def memory_report(self):
+        return self.profiler.report() if self.profiler is not None else None
+
+
+# plays one headless match on the map generated from seed and returns the finished world
+def play_match(seed, **world_options):
+    random.seed(seed)
+    world = World(HEIGHT, WIDTH, 0, **world_options)
+    world.generate_world()
+    while not world.win:
+        world.step()
+    world.terminate_agents()
+    return world
+
 
+class Flag(ZobristEntity):
 
-class Flag:
+    __slots__ = ("store", "slot", "agent_holding", "ascii_tile", "zobrist")
+    HASHED_FIELDS = ("position", "agent_holding")
 
-    def __init__(self, color, position):
+    color = stored("color")
+    position = stored("position")
+
+    def __init__(self, color, position, store=None):
+        self.zobrist = None
+        self.store = store if store is not None else EntityStore()
+        self.slot = self.store.allocate(self)
         self.color = color
         self.position = position
         self.agent_holding = None
@@ -166,121 +470,128 @@ class Flag:
         elif self.color == "red":
             self.ascii_tile = ASCII_TILES["red_flag"]
 
+    def zobrist_state(self):
+        holder = self.agent_holding
+        return ("flag", self.color, self.position, holder.slot if holder else None)
+
+
+class Bullet(ZobristEntity):
+
+    __slots__ = ("store", "slot", "zobrist")
+    HASHED_FIELDS = ("position",)
 
-class Bullet:
+    ascii_tile = ASCII_TILES["bullet"]
+    color = stored("color")
+    direction = stored("direction")
+    position = stored("position")
 
-    def __init__(self, agent, direction):
+    def __init__(self, agent, direction, store=None):
+        self.zobrist = None
+        self.store = store if store is not None else EntityStore()
+        self.slot = self.store.allocate(self)
+        self.reset(agent, direction)
+
+    def reset(self, agent, direction):
         self.color = agent.color
         self.direction = direction
         self.position = agent.position
-        self.ascii_tile = ASCII_TILES["bullet"]
+
+    def zobrist_state(self):
+        return ("bullet", self.color, self.direction, self.position)
     
     # bullet movement and collision (with walls or players)
-    def update(self, worldmap_buffer, agents):
-        for i in range(len(agents)-1, -1, -1):
-            if agents[i].position == self.position and agents[i].color != self.color:
-                agents[i].terminate(reason = "died")
-                del agents[i]
-                return True
+    def update(self, world):
+        if self._hit_agent(world):
+            return True
                 
         self.position = (self.position[0] + self.direction[0], self.position[1] + self.direction[1])
         
-        tile = worldmap_buffer[self.position[1]][self.position[0]]
+        tile = world.worldmap_buffer[self.position[1]][self.position[0]]
         if tile == ASCII_TILES["wall"]:
             return True
+        return self._hit_agent(world)
+
+    def _hit_agent(self, world):
+        agents = world.agents
         for i in range(len(agents)-1, -1, -1):
             if agents[i].position == self.position and agents[i].color != self.color:
                 agents[i].terminate(reason = "died")
+                if agents[i].zobrist:
+                    agents[i].zobrist.detach(agents[i])
+                agents[i].alive = False
+                world.alive_counts[agents[i].color] -= 1
                 del agents[i]
                 return True
         return False
 
 
-# returns coordinates of tiles between two locations (line of sight)
-def _bresenham_line(x1, y1, x2, y2):
-    dx = abs(x2 - x1)
-    dy = abs(y2 - y1)
-    sx = 1 if x1 < x2 else -1
-    sy = 1 if y1 < y2 else -1
-    err = dx - dy
-
-    while x1 != x2 or y1 != y2:
-        yield x1, y1
-        e2 = err * 2
-        
-        if e2 > -dy:
-            err -= dy
-            x1 += sx
-            
-        if e2 < dx:
-            err += dx
-            y1 += sy
-
+class AgentEngine(ZobristEntity):
 
-class AgentEngine:
+    __slots__ = ("store", "slot", "prev_position", "can_shoot", "holding_flag", "ascii_tile", "index", "agent", "zobrist")
+    HASHED_FIELDS = ("position", "ascii_tile", "can_shoot", "can_shoot_countdown")
 
     blue_index = 0
     red_index = 0
+    decision_caches = {}
+    CAN_SHOOT_DELAY = 3
+    PLANNING_SHARE = 0.8  # of the decision budget handed to the agent as its deadline, the rest is slack
+    FALLBACK_ACTION = (None, None)  # stands still, replaces the decision of an agent that overran its budget
+
+    color = stored("color")
+    position = stored("position")
+    can_shoot_countdown = stored("cooldown")
+    alive = stored("alive")
 
-    def __init__(self, color, position):
+    def __init__(self, color, position, store=None, brain=None):
+        self.zobrist = None
+        self.store = store if store is not None else EntityStore()
+        self.slot = self.store.allocate(self)
         self.color = color
         self.position = position
         self.prev_position = self.position
         
         self.can_shoot = True
         self.can_shoot_countdown = 0
-        self.CAN_SHOOT_DELAY = 3
         
         self.holding_flag = None
 
         if self.color == "blue":
             self.index = AgentEngine.blue_index
             AgentEngine.blue_index += 1
-            self.agent = B_agent(self.color, self.index)
+            self.agent = (brain or load_agent(BLUE_AGENT, "blue"))(self.color, self.index)
             self.ascii_tile = ASCII_TILES["blue_agent"]
         elif self.color == "red":
             self.index = AgentEngine.red_index
             AgentEngine.red_index += 1
-            self.agent = R_agent(self.color, self.index)
+            self.agent = (brain or load_agent(RED_AGENT, "red"))(self.color, self.index)
             self.ascii_tile = ASCII_TILES["red_agent"]
+
+        # one cache per agent implementation and color, shared across matches, only for deterministic
+        # policies; brains in decision workers get theirs from the worker, see decision_pool
+        attach_cache(self.agent, AgentEngine.decision_caches, DECISION_CACHE_SIZE)
+
+    # the slot identifies the agent within its match (index keeps counting across matches), so equal
+    # states of different matches or processes hash the same
+    def zobrist_state(self):
+        return ("agent", self.color, self.slot, self.position, self.ascii_tile, self.can_shoot, self.can_shoot_countdown)
             
     def terminate(self, reason):
         if self.holding_flag:
             self.holding_flag.agent_holding = None
         self.agent.terminate(reason)
     
+    # line of sight only depends on the static walls, see visibility.VisibilityCache
     def get_visible_world(self, world):
-        max_distance = 4
-        visible_world = []
-        
-        ## the square of world within max_distance of the agent
-        for y in range(0, max_distance*2+1):
-            y_world = self.position[1] + y - max_distance
-            visible_world.append([])
-            for x in range(0, max_distance*2+1):
-                x_world = self.position[0] + x - max_distance
-                if x_world >= 0 and x_world < world.width and y_world >= 0 and y_world < world.height:
-                    visible_world[-1].append(world.worldmap_buffer[y_world][x_world])
-                else:
-                    visible_world[-1].append(ASCII_TILES["unknown"])
-                    
-        ## obstructed vision of the world - line of sight
-        agent_x, agent_y = max_distance, max_distance
-        for y in range(len(visible_world)):
-            for x in range(len(visible_world[0])):
-                for x_online, y_online in _bresenham_line(agent_x, agent_y, x, y):
-                    tile = visible_world[y_online][x_online]
-                    if tile == ASCII_TILES["wall"]:
-                        visible_world[y][x] = ASCII_TILES["unknown"]
-                        break
-        
-        return visible_world
+        return world.visibility.observe(world.worldmap_buffer, self.position[0], self.position[1])
     
-    # controlling movement and shooting from blue_agent.py and red_agent.py
-    def control(self, world):
-        action, direction = self.agent.update(self.get_visible_world(world), self.position, self.can_shoot, self.holding_flag)
+    # arguments of Agent.update in blue_agent.py and red_agent.py
+    def observe(self, world):
+        return self.get_visible_world(world), self.position, self.can_shoot, self.holding_flag
 
+    # controlling movement and shooting with a decision of the agent
+    def act(self, world, action, direction):
         if action == "move":
+            world.move_stats["moves"] += 1
             self.prev_position = self.position
             x = self.position[0]
             y = self.position[1]
@@ -289,10 +600,10 @@ class AgentEngine:
             elif direction == "up":    self.position = (x, y-1)
             elif direction == "down":  self.position = (x, y+1)
         elif action == "shoot" and self.can_shoot:
-            if   direction == "right": world.bullets.append( Bullet(self, direction=(1, 0)) )
-            elif direction == "left":  world.bullets.append( Bullet(self, direction=(-1, 0)) )
-            elif direction == "up":    world.bullets.append( Bullet(self, direction=(0, -1)) )
-            elif direction == "down":  world.bullets.append( Bullet(self, direction=(0, 1)) )
+            if   direction == "right": world.spawn_bullet(self, direction=(1, 0))
+            elif direction == "left":  world.spawn_bullet(self, direction=(-1, 0))
+            elif direction == "up":    world.spawn_bullet(self, direction=(0, -1))
+            elif direction == "down":  world.spawn_bullet(self, direction=(0, 1))
             self.can_shoot = False
             self.can_shoot_countdown += self.CAN_SHOOT_DELAY
     
@@ -303,29 +614,23 @@ class AgentEngine:
         # collision with walls
         if world.worldmap[y][x] == ASCII_TILES["wall"]:
             self.position = self.prev_position
+            world.move_stats["bounced"] += 1
         
         # flag capturing / collision
-        elif self.color == "blue":
-            if world.worldmap_buffer[y][x] == ASCII_TILES["red_flag"] and not world.flags[1].agent_holding:
-                self.holding_flag = world.flags[1]
-                world.flags[1].agent_holding = self
-                self.ascii_tile = ASCII_TILES["blue_agent_f"]
-            elif world.worldmap_buffer[y][x] == ASCII_TILES["blue_flag"]:
-                if self.holding_flag:
-                    world.win = "blue"
-                else:  # collision
-                    self.position = self.prev_position
-                
-        elif self.color == "red":
-            if world.worldmap_buffer[y][x] == ASCII_TILES["blue_flag"] and not world.flags[0].agent_holding:
-                self.holding_flag = world.flags[0]
-                world.flags[0].agent_holding = self
-                self.ascii_tile = ASCII_TILES["red_agent_f"]
-            elif world.worldmap_buffer[y][x] == ASCII_TILES["red_flag"]:
+        else:
+            own_flag = world.flag_by_color[self.color]
+            enemy_flag = world.flag_by_color["red" if self.color == "blue" else "blue"]
+            if world.worldmap_buffer[y][x] == enemy_flag.ascii_tile and not enemy_flag.agent_holding:
+                self.holding_flag = enemy_flag
+                enemy_flag.agent_holding = self
+                self.ascii_tile = ASCII_TILES[self.color + "_agent_f"]
+            elif world.worldmap_buffer[y][x] == own_flag.ascii_tile:
                 if self.holding_flag:
-                    world.win = "red"
+                    world.win = self.color
+                    world.win_reason = "flag"
                 else:  # collision
                     self.position = self.prev_position
+                    world.move_stats["bounced"] += 1
     
     # shooting cooldown
     def update_can_shoot(self):
@@ -0,0 +1,316 @@
+from tournament import World
+from visibility import VIEW_DISTANCE, VIEW_SIZE
+from config import *
+
+import random
+
+
+DIRECTIONS = {"right": (1, 0), "left": (-1, 0), "up": (0, -1), "down": (0, 1)}
+COLORS = ("blue", "red")
+AGENT_TILES = ((ASCII_TILES["blue_agent"], ASCII_TILES["blue_agent_f"]), (ASCII_TILES["red_agent"], ASCII_TILES["red_agent_f"]))
+FLAG_TILES = (ASCII_TILES["blue_flag"], ASCII_TILES["red_flag"])
+AGENT_BYTES = tuple(tuple(ord(tile) for tile in tiles) for tiles in AGENT_TILES)
+FLAG_BYTES = tuple(ord(tile) for tile in FLAG_TILES)
+BULLET_BYTE = ord(ASCII_TILES["bullet"])
+
+
+# K headless matches stepped in lockstep, one agent tick and the following bullet ticks per step
+#
+# state of all worlds lives in flat parallel arrays (agent i of world k is at k*agents_per_world + i)
+# so every phase is a single pass over all worlds. Game rules, timeout and stalemate adjudication
+# follow World and AgentEngine; there are no brains, knowledge bases, decision budgets or display.
+#
+# observations are sliced out of one rendered string per world and step. With 6 agents per world
+# that is about 8-11k world-steps/s once the line of sight masks of the visited cells are cached and
+# about half that on fresh maps, where computing the masks dominates (VISIBILITY_PRECOMPUTE moves it
+# into reset)
+class VecWorld:
+
+    def __init__(self, num_worlds, height=HEIGHT, width=WIDTH, max_ticks=MAX_TICKS, stalemate_repeats=STALEMATE_REPEATS,
+                 team_size=TEAM_SIZE):
+        self.num_worlds = num_worlds
+        self.team_size = team_size
+        self.height = height
+        self.width = width
+        self.max_ticks = max_ticks
+        self.stalemate_repeats = stalemate_repeats
+        self.agents_per_world = 0
+        # rendered maps get a border of VIEW_DISTANCE cells so every window is a plain slice
+        self.padded_width = width + 2 * VIEW_DISTANCE
+
+    def reset(self, seeds=None):
+        cells = self.height * self.width
+        self.walls = bytearray(self.num_worlds * cells)
+        self.agent_x, self.agent_y, self.prev_x, self.prev_y = [], [], [], []
+        self.agent_color = bytearray()
+        self.flag_x, self.flag_y, self.flag_holder = [], [], []
+        self.visibility = []
+        self.static_maps = []   # padded worldmap of every world as bytes
+        self.hidden = []        # per world {(x, y): [(window y, window x), ...] an agent there can not see}
+
+        border = ASCII_TILES["unknown"] * VIEW_DISTANCE
+        blank_rows = [ASCII_TILES["unknown"] * self.padded_width] * VIEW_DISTANCE
+        for k in range(self.num_worlds):
+            if seeds is not None:
+                random.seed(seeds[k])
+            world = World.layout_only(self.height, self.width, self.team_size)
+            flag_positions, spawn_positions = world.generate_layout()
+            if k == 0:
+                self.agents_per_world = len(spawn_positions)
+            elif len(spawn_positions) != self.agents_per_world:
+                raise ValueError("all worlds need the same number of agents")
+
+            self.visibility.append(world.visibility)
+            self.hidden.append({})
+            rows = [border + "".join(row) + border for row in world.worldmap]
+            self.static_maps.append("".join(blank_rows + rows + blank_rows).encode("ascii"))
+            offset = k * cells
+            for y, row in enumerate(world.worldmap):
+                for x, tile in enumerate(row):
+                    if tile == ASCII_TILES["wall"]:
+                        self.walls[offset + y * self.width + x] = 1
+            for color, (x, y) in flag_positions:
+                self.flag_x.append(x)
+                self.flag_y.append(y)
+                self.flag_holder.append(-1)
+            for color, (x, y) in spawn_positions:
+                self.agent_x.append(x)
+                self.agent_y.append(y)
+                self.agent_color.append(COLORS.index(color))
+        self.alive_counts = [[self.agent_color[k * self.agents_per_world:(k + 1) * self.agents_per_world].count(color)
+                              for color in range(len(COLORS))] for k in range(self.num_worlds)]
+        self.prev_x = list(self.agent_x)
+        self.prev_y = list(self.agent_y)
+
+        num_agents = len(self.agent_x)
+        self.alive = bytearray([1]) * num_agents
+        self.holding = bytearray(num_agents)
+        self.can_shoot = bytearray([1]) * num_agents
+        self.cooldown = [0] * num_agents
+
+        self.bullet_world, self.bullet_x, self.bullet_y = [], [], []
+        self.bullet_dx, self.bullet_dy, self.bullet_color = [], [], []
+
+        self.ticks = [0] * self.num_worlds
+        self.win = [""] * self.num_worlds
+        self.win_reason = [""] * self.num_worlds
+        self.done = bytearray(self.num_worlds)
+        self.state_counts = [{} for _ in range(self.num_worlds)]
+        self.max_state_repeats = [0] * self.num_worlds
+
+        self._check_win_states()
+        return self.observe()
+
+    # actions[k][i] is the (action, direction) of agent i in world k, None for dead agents
+    def step(self, actions):
+        started = bytearray(not done for done in self.done)
+        active = bytearray(started)
+        self._update_agents(actions, active)
+        self._advance(active)
+
+        for _ in range(4):
+            self._check_win_states(active)
+            self._update_bullets(active)
+            self._advance(active)
+        self._check_win_states(active)
+
+        rewards = [0] * self.num_worlds
+        infos = []
+        for k in range(self.num_worlds):
+            if started[k] and self.done[k]:
+                rewards[k] = 1 if self.win[k] == "blue" else -1 if self.win[k] == "red" else 0
+            infos.append({"win": self.win[k], "win_reason": self.win_reason[k], "tick": self.ticks[k]})
+        return self.observe(), rewards, bytearray(self.done), infos
+
+    # ends the matches whose tick produced a result, like the `while not world.win` loop in main()
+    def _advance(self, active):
+        for k in range(self.num_worlds):
+            if active[k]:
+                self.ticks[k] += 1
+                if self.win[k]:
+                    self.done[k] = 1
+                    active[k] = 0
+
+    # observations[k][i] = (visible_world, position, can_shoot, holding_flag) as AgentEngine.control passes them
+    def observe(self):
+        maps = self._render()
+        unknown = ASCII_TILES["unknown"]
+        window_height = VIEW_SIZE * self.padded_width
+        observations = []
+        for k in range(self.num_worlds):
+            observations.append([None] * self.agents_per_world)
+            if self.done[k]:
+                continue
+            rendered = maps[k]
+            hidden_cells = self.hidden[k]
+            for i in range(k * self.agents_per_world, (k + 1) * self.agents_per_world):
+                if not self.alive[i]:
+                    continue
+                x, y = self.agent_x[i], self.agent_y[i]
+                hidden = hidden_cells.get((x, y))
+                if hidden is None:
+                    mask = self.visibility[k].mask(x, y)
+                    hidden = hidden_cells[(x, y)] = [divmod(cell, VIEW_SIZE) for cell in range(VIEW_SIZE * VIEW_SIZE)
+                                                     if not mask >> cell & 1]
+                # the window's top left corner is at (x, y) in the padded map
+                first_cell = y * self.padded_width + x
+                visible_world = [list(rendered[start:start + VIEW_SIZE])
+                                 for start in range(first_cell, first_cell + window_height, self.padded_width)]
+                for window_y, window_x in hidden:
+                    visible_world[window_y][window_x] = unknown
+                observations[k][i - k * self.agents_per_world] = (visible_world, (x, y), bool(self.can_shoot[i]), bool(self.holding[i]))
+        return observations
+
+    # padded map of every world with everything buffer_worldmap draws over the static map
+    def _render(self):
+        maps = [bytearray(static_map) for static_map in self.static_maps]
+        width, origin = self.padded_width, VIEW_DISTANCE * (self.padded_width + 1)
+        for j in range(len(self.bullet_world)):
+            maps[self.bullet_world[j]][origin + self.bullet_y[j] * width + self.bullet_x[j]] = BULLET_BYTE
+        for i in range(len(self.agent_x)):
+            if self.alive[i]:
+                maps[i // self.agents_per_world][origin + self.agent_y[i] * width + self.agent_x[i]] = \
+                    AGENT_BYTES[self.agent_color[i]][self.holding[i]]
+        for f in range(len(self.flag_x)):
+            if self.flag_holder[f] == -1:
+                maps[f // 2][origin + self.flag_y[f] * width + self.flag_x[f]] = FLAG_BYTES[f % 2]
+        return [rendered.decode("ascii") for rendered in maps]
+
+    def _update_agents(self, actions, active):
+        # flags drawn in this tick's buffer, collisions read them before any pickup
+        flag_drawn = [holder == -1 for holder in self.flag_holder]
+        cells = self.height * self.width
+
+        for i in range(len(self.agent_x)):
+            k = i // self.agents_per_world
+            if not active[k] or not self.alive[i]:
+                continue
+            action = actions[k][i - k * self.agents_per_world]
+            if action is None:
+                continue
+            action, direction = action
+            delta = DIRECTIONS.get(direction)
+            if action == "move":
+                self.prev_x[i], self.prev_y[i] = self.agent_x[i], self.agent_y[i]
+                if delta:
+                    self.agent_x[i] += delta[0]
+                    self.agent_y[i] += delta[1]
+            elif action == "shoot" and self.can_shoot[i]:
+                if delta:
+                    self.bullet_world.append(k)
+                    self.bullet_x.append(self.agent_x[i])
+                    self.bullet_y.append(self.agent_y[i])
+                    self.bullet_dx.append(delta[0])
+                    self.bullet_dy.append(delta[1])
+                    self.bullet_color.append(self.agent_color[i])
+                self.can_shoot[i] = 0
+                self.cooldown[i] += 3
+
+        for i in range(len(self.agent_x)):
+            k = i // self.agents_per_world
+            if not active[k] or not self.alive[i]:
+                continue
+            x, y = self.agent_x[i], self.agent_y[i]
+            own_flag = k * 2 + self.agent_color[i]
+            enemy_flag = k * 2 + 1 - self.agent_color[i]
+
+            if self.walls[k * cells + y * self.width + x]:
+                self.agent_x[i], self.agent_y[i] = self.prev_x[i], self.prev_y[i]
+            elif flag_drawn[enemy_flag] and (x, y) == (self.flag_x[enemy_flag], self.flag_y[enemy_flag]):
+                if self.flag_holder[enemy_flag] == -1:
+                    self.flag_holder[enemy_flag] = i
+                    self.holding[i] = 1
+            elif flag_drawn[own_flag] and (x, y) == (self.flag_x[own_flag], self.flag_y[own_flag]):
+                if self.holding[i]:
+                    self.win[k] = COLORS[self.agent_color[i]]
+                    self.win_reason[k] = "flag"
+                else:
+                    self.agent_x[i], self.agent_y[i] = self.prev_x[i], self.prev_y[i]
+
+            if not self.can_shoot[i] and self.cooldown[i] > 0:
+                self.cooldown[i] -= 1
+            else:
+                self.can_shoot[i] = 1
+        self._record_states(active)
+
+    # counts repeated states after every agent tick like World._record_state; the key xors the
+    # hashes of the same entity states World.state_hash covers (slot is the index within the world)
+    def _record_states(self, active):
+        keys = [0] * self.num_worlds
+        for j in range(len(self.bullet_world)):
+            keys[self.bullet_world[j]] ^= hash(("bullet", self.bullet_color[j], self.bullet_dx[j], self.bullet_dy[j],
+                                                self.bullet_x[j], self.bullet_y[j]))
+        for i in range(len(self.agent_x)):
+            if self.alive[i]:
+                keys[i // self.agents_per_world] ^= hash(("agent", self.agent_color[i], i % self.agents_per_world, self.agent_x[i],
+                                                          self.agent_y[i], self.holding[i], self.can_shoot[i], self.cooldown[i]))
+        for f in range(len(self.flag_holder)):
+            holder = self.flag_holder[f]
+            keys[f // 2] ^= hash(("flag", f % 2, holder % self.agents_per_world if holder != -1 else None))
+
+        for k in range(self.num_worlds):
+            if active[k]:
+                counts = self.state_counts[k]
+                counts[keys[k]] = counts.get(keys[k], 0) + 1
+                self.max_state_repeats[k] = max(self.max_state_repeats[k], counts[keys[k]])
+
+    def _update_bullets(self, active):
+        cells = self.height * self.width
+        keep = bytearray([1]) * len(self.bullet_world)
+        for j in range(len(self.bullet_world) - 1, -1, -1):
+            k = self.bullet_world[j]
+            if not active[k]:
+                continue
+            if self._hit_agent(j):
+                keep[j] = 0
+                continue
+            self.bullet_x[j] += self.bullet_dx[j]
+            self.bullet_y[j] += self.bullet_dy[j]
+            if self.walls[k * cells + self.bullet_y[j] * self.width + self.bullet_x[j]] or self._hit_agent(j):
+                keep[j] = 0
+
+        if not all(keep):
+            for name in ("bullet_world", "bullet_x", "bullet_y", "bullet_dx", "bullet_dy", "bullet_color"):
+                values = getattr(self, name)
+                setattr(self, name, [value for value, kept in zip(values, keep) if kept])
+
+    def _hit_agent(self, j):
+        k = self.bullet_world[j]
+        for i in range((k + 1) * self.agents_per_world - 1, k * self.agents_per_world - 1, -1):
+            if self.alive[i] and self.agent_color[i] != self.bullet_color[j] and \
+                    self.agent_x[i] == self.bullet_x[j] and self.agent_y[i] == self.bullet_y[j]:
+                self.alive[i] = 0
+                self.alive_counts[k][self.agent_color[i]] -= 1
+                for f in (k * 2, k * 2 + 1):
+                    if self.flag_holder[f] == i:
+                        self.flag_holder[f] = -1
+                return True
+        return False
+
+    # alive_counts is kept up to date when agents die, see _hit_agent
+    def _check_win_states(self, active=None):
+        for k in range(self.num_worlds):
+            if self.done[k] or (active is not None and not active[k]):
+                continue
+            counts = self.alive_counts[k]
+            if counts[0] == 0 and counts[1] == 0:
+                self.win[k], self.win_reason[k] = "tied", "eliminated"
+            elif counts[1] == 0:
+                self.win[k], self.win_reason[k] = "blue", "eliminated"
+            elif counts[0] == 0:
+                self.win[k], self.win_reason[k] = "red", "eliminated"
+            elif self.win[k]:
+                pass
+            elif self.max_ticks and self.ticks[k] >= self.max_ticks:
+                self._adjudicate(k, "timeout")
+            elif self.stalemate_repeats and self.max_state_repeats[k] >= self.stalemate_repeats:
+                self._adjudicate(k, "stalemate")
+
+    # like World._adjudicate, 2 points per survivor plus 1 for holding the enemy flag
+    def _adjudicate(self, k, reason):
+        score = [count * 2 for count in self.alive_counts[k]]
+        for i in range(k * self.agents_per_world, (k + 1) * self.agents_per_world):
+            if self.alive[i] and self.holding[i]:
+                score[self.agent_color[i]] += 1
+        self.win[k] = "blue" if score[0] > score[1] else "red" if score[1] > score[0] else "tied"
+        self.win_reason[k] = reason
@@ -0,0 +1,136 @@
+from config import *
+
+from collections import OrderedDict
+import sys
+
+
+VIEW_DISTANCE = 4
+VIEW_SIZE = VIEW_DISTANCE * 2 + 1
+
+
+# returns coordinates of tiles between two locations (line of sight)
+def bresenham_line(x1, y1, x2, y2):
+    dx = abs(x2 - x1)
+    dy = abs(y2 - y1)
+    sx = 1 if x1 < x2 else -1
+    sy = 1 if y1 < y2 else -1
+    err = dx - dy
+
+    while x1 != x2 or y1 != y2:
+        yield x1, y1
+        e2 = err * 2
+
+        if e2 > -dy:
+            err -= dy
+            x1 += sx
+
+        if e2 < dx:
+            err += dx
+            y1 += sy
+
+
+# window cells on the line of sight from the centre to every window cell, in scan order
+SIGHT_LINES = [[y_line * VIEW_SIZE + x_line for x_line, y_line in bresenham_line(VIEW_DISTANCE, VIEW_DISTANCE, x, y)]
+               for y in range(VIEW_SIZE) for x in range(VIEW_SIZE)]
+
+_OPEN, _WALL, _HIDDEN = 0, 1, 2
+
+
+# walls never change during a match, so which window cells an agent sees depends only on its cell
+#
+# masks are 81 bit ints (bit y*9+x set when the window cell is visible), computed with the same
+# scan order and occlusion rules as the original per-tick line of sight pass
+class VisibilityCache:
+
+    def __init__(self, worldmap, max_entries=0):
+        self.worldmap = worldmap
+        self.height = len(worldmap)
+        self.width = len(worldmap[0])
+        self.max_entries = max_entries
+        self.masks = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def compute_mask(self, x, y):
+        window = []
+        for y_world in range(y - VIEW_DISTANCE, y + VIEW_DISTANCE + 1):
+            for x_world in range(x - VIEW_DISTANCE, x + VIEW_DISTANCE + 1):
+                if 0 <= x_world < self.width and 0 <= y_world < self.height:
+                    window.append(_WALL if self.worldmap[y_world][x_world] == ASCII_TILES["wall"] else _OPEN)
+                else:
+                    window.append(_HIDDEN)
+        mask = 0
+        for index, line in enumerate(SIGHT_LINES):
+            for index_online in line:
+                if window[index_online] == _WALL:
+                    window[index] = _HIDDEN
+                    break
+            if window[index] != _HIDDEN:
+                mask |= 1 << index
+        return mask
+
+    def mask(self, x, y):
+        cell = y * self.width + x
+        mask = self.masks.get(cell)
+        if mask is not None:
+            self.hits += 1
+            if self.max_entries:
+                self.masks.move_to_end(cell)
+            return mask
+        self.misses += 1
+        mask = self.masks[cell] = self.compute_mask(x, y)
+        if self.max_entries and len(self.masks) > self.max_entries:
+            self.masks.popitem(last=False)
+            self.evictions += 1
+        return mask
+
+    # fills the cache for every floor cell up front, e.g. right after map generation
+    def precompute(self):
+        for y in range(self.height):
+            for x in range(self.width):
+                if self.worldmap[y][x] != ASCII_TILES["wall"]:
+                    self.mask(x, y)
+
+    # visible world of an agent at (x, y): the masked window of worldmap_buffer
+    def observe(self, worldmap_buffer, x, y):
+        mask = self.mask(x, y)
+        unknown = ASCII_TILES["unknown"]
+        visible_world = []
+        for window_y in range(VIEW_SIZE):
+            row = []
+            y_world = y + window_y - VIEW_DISTANCE
+            row_mask = mask >> (window_y * VIEW_SIZE)
+            for window_x in range(VIEW_SIZE):
+                if row_mask >> window_x & 1:
+                    row.append(worldmap_buffer[y_world][x + window_x - VIEW_DISTANCE])
+                else:
+                    row.append(unknown)
+            visible_world.append(row)
+        return visible_world
+
+    # {(x, y): tile in worldmap_buffer} of every cell seen by at least one of the agents at positions
+    def observe_team(self, worldmap_buffer, positions):
+        seen = {}
+        for x, y in positions:
+            mask = self.mask(x, y)
+            while mask:
+                bit = mask & -mask
+                index = bit.bit_length() - 1
+                cell = (x + index % VIEW_SIZE - VIEW_DISTANCE, y + index // VIEW_SIZE - VIEW_DISTANCE)
+                if cell not in seen:
+                    seen[cell] = worldmap_buffer[cell[1]][cell[0]]
+                mask ^= bit
+        return seen
+
+    def memory_footprint(self):
+        return sys.getsizeof(self.masks) + sum(sys.getsizeof(cell) + sys.getsizeof(mask) for cell, mask in self.masks.items())
+
+    def stats(self):
+        return {
+            "entries": len(self.masks),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "bytes": self.memory_footprint(),
+        }
@@ -0,0 +1,57 @@
+import hashlib
+
+
+# incrementally maintained fingerprint of every attached entity state
+class ZobristHash:
+
+    def __init__(self):
+        self.value = 0
+        self._keys = {}
+
+    # keys are derived from the state itself so hashes compare across worlds and processes
+    def key(self, state):
+        key = self._keys.get(state)
+        if key is None:
+            digest = hashlib.blake2b(repr(state).encode(), digest_size=8).digest()
+            key = self._keys[state] = int.from_bytes(digest, "little")
+        return key
+
+    # same value, shared key table
+    def fork(self):
+        zobrist = ZobristHash.__new__(ZobristHash)
+        zobrist.value = self.value
+        zobrist._keys = self._keys
+        return zobrist
+
+    def toggle(self, state):
+        self.value ^= self.key(state)
+
+    def attach(self, entity):
+        entity.zobrist = self
+        self.toggle(entity.zobrist_state())
+
+    def detach(self, entity):
+        if entity.zobrist is self:
+            self.toggle(entity.zobrist_state())
+            entity.zobrist = None
+
+
+# entities listing HASHED_FIELDS keep the attached hash in sync on every assignment; entities
+# without hashed fields have the constant state None
+class ZobristEntity:
+
+    __slots__ = ()
+    HASHED_FIELDS = ()
+    zobrist = None
+
+    def zobrist_state(self):
+        return None
+
+    def __setattr__(self, name, value):
+        zobrist = getattr(self, "zobrist", None) if name in self.HASHED_FIELDS else None
+        if zobrist is not None:
+            zobrist.toggle(self.zobrist_state())
+            object.__setattr__(self, name, value)
+            zobrist.toggle(self.zobrist_state())
+        else:
+            object.__setattr__(self, name, value)